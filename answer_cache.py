@@ -0,0 +1,132 @@
+import os
+import re
+import time
+import sqlite3
+import json
+import hashlib
+import threading
+import numpy as np
+import metrics
+from backend import embed_query, generate_answer_stream
+from context import HISTORY_TOKEN_BUDGET, trim_history
+from doc_cache import CACHE_DIR
+from llm_backends import LLM_BACKEND
+
+ANSWER_CACHE_PATH = os.path.join(CACHE_DIR, ".answers.sqlite3")
+ANSWER_CACHE_ENABLED = os.getenv("DOCUMIND_ANSWER_CACHE", "") == "1"
+SIMILARITY_THRESHOLD = 0.92
+TTL_SECONDS = 7 * 24 * 3600
+MAX_BYTES = 64 * 1024 ** 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    scope TEXT NOT NULL,
+    query TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    answer TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope, created);
+"""
+
+
+def answer_scope(doc_key, context, temp, max_tokens, chat_history=()):
+    """Answers are only reused for the same document, retrieved context, LLM backend, sampling
+    settings and conversation so far: "tell me more" means something else in every chat."""
+    history = json.dumps(trim_history(list(chat_history), HISTORY_TOKEN_BUDGET))
+    return hashlib.sha1(f"{LLM_BACKEND}\0{doc_key}\0{context}\0{temp}\0{max_tokens}\0{history}".encode()).hexdigest()
+
+
+def replay_stream(answer):
+    """Re-emit a stored answer as word-sized deltas, like a live completion stream."""
+    yield from re.findall(r"\S+\s*|\s+", answer)
+
+
+# ---------- STORE ----------
+class SemanticAnswerCache:
+    """Disk-backed answers looked up by query-embedding cosine similarity within a scope."""
+
+    def __init__(self, path=ANSWER_CACHE_PATH, threshold=SIMILARITY_THRESHOLD, ttl=TTL_SECONDS, max_bytes=MAX_BYTES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def lookup(self, scope, q_embed):
+        q = np.asarray(q_embed, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) or 1.0)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, embedding, answer FROM answers WHERE scope = ? AND created > ?",
+                (scope, time.time() - self.ttl),
+            ).fetchall()
+            if not rows:
+                return None
+            cached = np.frombuffer(b"".join(r[1] for r in rows), dtype=np.float32).reshape(len(rows), -1)
+            best = int(np.argmax(cached @ q))
+            if float(cached[best] @ q) < self.threshold:
+                return None
+            self._db.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), rows[best][0]))
+            self._db.commit()
+            return rows[best][2]
+
+    def store(self, scope, query, q_embed, answer):
+        q = np.asarray(q_embed, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) or 1.0)
+        blob = q.tobytes()
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO answers (scope, query, embedding, answer, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (scope, query, blob, answer, len(blob) + len(answer.encode()) + len(query.encode()), now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM answers WHERE created <= ?", (now - self.ttl,))
+        (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM answers").fetchone()
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used rows until back under budget.
+        excess = total - self.max_bytes
+        freed = 0
+        doomed = []
+        for row_id, size in self._db.execute("SELECT id, size FROM answers ORDER BY last_used"):
+            doomed.append((row_id,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM answers WHERE id = ?", doomed)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+
+
+# ---------- STREAMING ----------
+def cached_answer_stream(cache, doc_key, query, context, chat_history, temp, max_tokens):
+    """generate_answer_stream with a semantic cache in front of the LLM call."""
+    scope = answer_scope(doc_key, context, temp, max_tokens, chat_history)
+    q_embed = embed_query(query)
+    answer = cache.lookup(scope, q_embed)
+    metrics.incr("answer_cache_hits" if answer is not None else "answer_cache_misses")
+    if answer is not None:
+        yield from replay_stream(answer)
+        return
+    parts = []
+    for token in generate_answer_stream(query, context, chat_history, temp, max_tokens):
+        parts.append(token)
+        yield token
+    # Only complete answers are cached; an interrupted stream never reaches here, and one
+    # that used the whole token limit (one delta per token) was most likely cut off.
+    if len(parts) < max_tokens:
+        cache.store(scope, query, q_embed, "".join(parts))
@@ -1,22 +1,50 @@
+import io
 import os
-import faiss
-import httpx
+import threading
+import weakref
+import itertools
+import time
+from collections import OrderedDict
 import numpy as np
-from groq import Groq
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
-from pypdf import PdfReader
+import metrics
+from chunking import CHUNK_TOKENS, chunk_pages
+from context import HISTORY_TOKEN_BUDGET, estimate_tokens, trim_history
+from doc_cache import cache_key
+from extract import PageCache, iter_pages
+from indexes import RESCORE_FACTOR, build_index, check_index_config, to_index_space
+from lexical import BM25Index, rrf_fuse
+from llm_backends import get_backend, get_client
 
 load_dotenv()
 
-client = Groq(
-    api_key=os.getenv("GROQ_API_KEY"),
-    timeout=httpx.Timeout(60.0, connect=10.0),
-    max_retries=2,
-)
-embed_model = SentenceTransformer("all-MiniLM-L6-v2")
+EMBED_MODEL = "all-MiniLM-L6-v2"
+# Path of a shared embed_server.py socket; empty means load the model in-process.
+EMBED_SOCKET = os.getenv("DOCUMIND_EMBED_SOCKET", "")
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 200
+# Ingest uses the sentence-aware chunker; part of every cache key.
+CHUNK_SCHEME = f"structured-{CHUNK_TOKENS}"
 
-MODEL = "llama-3.3-70b-versatile"
+# "auto" picks flat/HNSW/IVF/IVF-PQ from the chunk count and memory budget.
+INDEX_KIND = os.getenv("DOCUMIND_INDEX_KIND", "auto")
+INDEX_MEMORY_BUDGET = int(os.getenv("DOCUMIND_INDEX_MEMORY_MB", "0")) * 1024 ** 2 or None
+# How the index stores vectors (float32, fp16, int8 or pq); the index is the only in-memory copy.
+# Bytes per 384-d vector / recall@10 vs exact search on clustered test data (python indexes.py):
+#   float32 1536 / 1.0 · fp16 768 / 0.999 · int8 384 / 0.96-0.98 · int8 + rescore 1152 / 0.999
+#   pq (IVF) + rescore 484 / 0.84 at 4 candidates per result, 0.96 at 16
+VECTOR_STORAGE = os.getenv("DOCUMIND_VECTOR_STORAGE", "float32")
+# Candidates per result re-ranked with finer codes for int8/pq storage; 0 disables rescoring.
+# Rescoring keeps those finer codes next to the coarse ones, so int8 with the default rescore
+# is 1152 bytes per vector, only 1.33x smaller than float32: set 0 when memory matters more.
+# It does not apply to float32 or fp16 storage, nor to kind "ivfpq" with float32 storage
+# (use storage "pq", which is IVF-PQ plus int8 rescoring, instead).
+VECTOR_RESCORE = int(os.getenv("DOCUMIND_VECTOR_RESCORE", str(RESCORE_FACTOR)))
+# Fail at startup, not halfway through someone's upload.
+try:
+    check_index_config(INDEX_KIND, VECTOR_STORAGE)
+except ValueError as e:
+    raise ValueError(f"Invalid DOCUMIND_INDEX_KIND / DOCUMIND_VECTOR_STORAGE: {e}") from None
 
 SYSTEM_PROMPT = """You are DocuMind AI — an expert document analyst. You provide thorough, detailed, well-structured answers based on the document context provided to you.
 
@@ -31,10 +59,74 @@ Your approach:
 - Be warm, professional, and helpful — like a knowledgeable research assistant."""
 
 
+# ---------- MODELS ----------
+# Heavy clients are built on first use, so importing backend stays cheap.
+_embed_model = None
+_model_lock = threading.Lock()
+
+
+def get_embed_model():
+    global _embed_model
+    with _model_lock:
+        if _embed_model is None:
+            _embed_model = _connect_embed_server() or _load_local_embedder()
+    return _embed_model
+
+
+def _connect_embed_server():
+    if not EMBED_SOCKET:
+        return None
+    from embed_server import RemoteEncoder
+    remote = RemoteEncoder(EMBED_SOCKET)
+    try:
+        remote.ping()
+    except OSError:
+        # Worker not running — fall back to a private copy of the model.
+        return None
+    return remote
+
+
+def _load_local_embedder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBED_MODEL)
+
+
+def __getattr__(name):
+    # Keep `backend.client` / `backend.embed_model` working for existing callers.
+    if name == "client":
+        return get_client()
+    if name == "embed_model":
+        return get_embed_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # ---------- PDF TEXT ----------
+_page_cache = None
+
+
+def get_page_cache():
+    global _page_cache
+    if _page_cache is None:
+        _page_cache = PageCache()
+    return _page_cache
+
+
+def read_pdf_pages(file, workers=None):
+    """Stream (page_number, text) pairs, extracting pages in parallel."""
+    data = file.getvalue() if hasattr(file, "getvalue") else file.read()
+    # Time only the extraction itself, not whatever the consumer does between pages.
+    elapsed = 0.0
+    started = time.perf_counter()
+    for page in iter_pages(data, workers=workers, cache=get_page_cache()):
+        elapsed += time.perf_counter() - started
+        metrics.incr("pages_extracted")
+        yield page
+        started = time.perf_counter()
+    metrics.record("extract", elapsed + time.perf_counter() - started)
+
+
 def read_pdf(file):
-    reader = PdfReader(file)
-    return "\n".join(page.extract_text() for page in reader.pages if page.extract_text())
+    return "\n".join(text for _, text in read_pdf_pages(file) if text)
 
 
 # ---------- CHUNKING ----------
@@ -49,34 +141,182 @@ def chunk_text(text, size, overlap):
 
 
 # ---------- VECTOR STORE ----------
-def create_vectorstore(chunks):
+def embed_texts(texts):
+    with metrics.span("embed"):
+        return np.atleast_2d(np.array(get_embed_model().encode(list(texts)), dtype=np.float32))
+
+
+def create_vectorstore(chunks, kind=None):
     if not chunks:
         raise ValueError("No text chunks to embed. The PDF may be empty or image-only.")
-    embeddings = embed_model.encode(chunks)
-    embeddings = np.atleast_2d(np.array(embeddings, dtype=np.float32))
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(embeddings)
+    embeddings = embed_texts(chunks)
+    metrics.incr("chunks_embedded", len(embeddings))
+    with metrics.span("index_build"):
+        index = build_index(embeddings, kind=kind or INDEX_KIND, memory_budget=INDEX_MEMORY_BUDGET,
+                            storage=VECTOR_STORAGE, rescore=VECTOR_RESCORE, ids=np.arange(len(embeddings)))
     return index, embeddings
 
 
+def create_lexical_index(chunks):
+    """Sparse BM25 index over the same chunks, for exact terms the embedder misses."""
+    with metrics.span("lexical_build"):
+        return BM25Index(chunks)
+
+
+# ---------- INGEST ----------
+def document_key(data):
+    """Cache key for a document under the current chunking, embedding and index settings."""
+    # With INDEX_KIND "auto" the memory budget decides the index kind.
+    return cache_key(data, CHUNK_SCHEME, EMBED_MODEL, INDEX_KIND, INDEX_MEMORY_BUDGET, VECTOR_STORAGE, VECTOR_RESCORE)
+
+
+def build_document(data, cache=None, workers=None):
+    """Extract, chunk and embed raw PDF bytes, reusing a cached build when possible."""
+    key = document_key(data)
+    if cache is not None:
+        hit = cache.get(key)
+        metrics.incr("doc_cache_hits" if hit is not None else "doc_cache_misses")
+        if hit is not None:
+            return hit
+    chunks = chunk_pages(read_pdf_pages(io.BytesIO(data), workers=workers))
+    text = chunks.buffer.freeze()
+    if not len(chunks):
+        raise ValueError("Could not extract text. The PDF may be image-only.")
+    index, embeddings = create_vectorstore(chunks)
+    if cache is not None:
+        cache.put(key, text, chunks, index, embeddings)
+    return text, chunks, index, embeddings
+
+
+# ---------- QUERY CACHES ----------
+QUERY_CACHE_SIZE = 1024
+RESULT_CACHE_SIZE = 512
+
+
+class LRUCache:
+    """Thread-safe bounded LRU mapping with hit/miss counters."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_query_embeddings = LRUCache(QUERY_CACHE_SIZE)
+_results = LRUCache(RESULT_CACHE_SIZE)
+_versions = itertools.count(1)
+_index_versions = weakref.WeakKeyDictionary()
+
+
+def normalize_query(query):
+    # MiniLM is uncased, so case and whitespace never change the embedding.
+    return " ".join(query.lower().split())
+
+
+def embed_query(query):
+    key = normalize_query(query)
+    q_embed = _query_embeddings.get(key)
+    metrics.incr("query_cache_hits" if q_embed is not None else "query_cache_misses")
+    if q_embed is None:
+        q_embed = embed_texts([key])
+        q_embed.setflags(write=False)
+        _query_embeddings.put(key, q_embed)
+    return q_embed
+
+
+def index_version(index):
+    """Version tag for result caching; changes whenever the index grows, shrinks or is bumped."""
+    if index is None:
+        return None
+    version = _index_versions.get(index)
+    if version is None:
+        version = _index_versions[index] = next(_versions)
+    return version, getattr(index, "ntotal", None)
+
+
+def bump_index_version(index):
+    """Invalidate cached results for an index mutated in place without changing its size."""
+    _index_versions[index] = next(_versions)
+
+
+def cache_stats():
+    return {"query_embeddings": _query_embeddings.stats(), "results": _results.stats()}
+
+
 # ---------- RETRIEVAL ----------
-def retrieve(query, chunks, index, embeddings, k=5):
-    q_embed = embed_model.encode([query])
+# How many candidates each retriever contributes before hybrid fusion.
+HYBRID_DEPTH = 4
+
+
+def retrieve(query, chunks, index, embeddings, k=5, lexical=None):
+    with metrics.span("retrieve"):
+        return _retrieve(query, chunks, index, k, lexical)
+
+
+def _retrieve(query, chunks, index, k, lexical):
     k = min(k, len(chunks))
-    _, idx = index.search(np.array(q_embed, dtype=np.float32), k)
-    return [chunks[i] for i in idx[0] if i < len(chunks)]
+    key = (index_version(index), index_version(lexical), len(chunks), normalize_query(query), k)
+    cached = _results.get(key)
+    metrics.incr("result_cache_hits" if cached is not None else "result_cache_misses")
+    if cached is not None:
+        return list(cached)
 
+    q_embed = embed_query(query)
+    depth = k if lexical is None else min(k * HYBRID_DEPTH, len(chunks))
+    with metrics.span("search"):
+        _, idx = index.search(to_index_space(index, q_embed), depth)
+    dense = [i for i in idx[0] if 0 <= i < len(chunks)]
+    if lexical is None:
+        result = [chunks[i] for i in dense]
+    else:
+        # Only fuse over chunks the lexical index has seen (it may lag a growing index).
+        with metrics.span("lexical_search"):
+            sparse = [i for i in lexical.search(query, depth) if i < len(chunks)]
+        result = [chunks[i] for i in rrf_fuse([dense, sparse], limit=k)]
+    _results.put(key, tuple(result))
+    return result
 
-# ---------- STREAMING LLM RESPONSE ----------
-def generate_answer_stream(query, context, chat_history, temp, max_tokens):
-    """Stream a detailed response using the document context and chat history."""
 
+# ---------- STREAMING LLM RESPONSE ----------
+def build_messages(query, context, chat_history):
     # Build conversation messages
     messages = [{"role": "system", "content": SYSTEM_PROMPT}]
 
-    # Add recent chat history for context continuity (last 6 exchanges)
-    for role, content in chat_history[-12:]:
+    # Add recent chat history for context continuity, older turns condensed to fit the budget
+    for role, content in trim_history(chat_history, HISTORY_TOKEN_BUDGET):
         messages.append({"role": role, "content": content})
 
     # The actual user query with context
@@ -91,23 +331,17 @@ Based on the document content above, please answer the following question in det
 **Question:** {query}"""
 
     messages.append({"role": "user", "content": user_prompt})
+    return messages
 
-    stream = client.chat.completions.create(
-        model=MODEL,
-        messages=messages,
-        temperature=temp,
-        max_tokens=max_tokens,
-        stream=True,
-    )
-    for chunk in stream:
-        content = chunk.choices[0].delta.content
-        if content:
-            yield content
+
+def generate_answer_stream(query, context, chat_history, temp, max_tokens):
+    """Stream a detailed response using the document context and chat history."""
+    messages = build_messages(query, context, chat_history)
+    metrics.incr("prompt_tokens", sum(estimate_tokens(m["content"]) for m in messages))
+    # The configured backend (llm_backends.py): Groq, the gateway, a local model or the mock.
+    yield from metrics.observe_stream(get_backend().stream(messages, temp, max_tokens))
 
 
 def generate_answer(query, context, chat_history, temp, max_tokens):
     """Non-streaming fallback."""
-    full = ""
-    for token in generate_answer_stream(query, context, chat_history, temp, max_tokens):
-        full += token
-    return full
\ No newline at end of file
+    return "".join(generate_answer_stream(query, context, chat_history, temp, max_tokens))
\ No newline at end of file
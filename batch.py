@@ -0,0 +1,157 @@
+"""Headless batch Q&A: ask a fixed question set against many PDFs.
+
+    python batch.py manifest.jsonl --questions questions.txt --out results.jsonl --workers 4
+
+The manifest has one document per line, either a bare path or a JSON object
+{"id": ..., "path": ..., "questions": [...]} whose questions are added to the
+shared set. The output file doubles as the checkpoint: each finished
+document is one JSON line, and a rerun skips documents already answered.
+Set DOCUMIND_EMBED_SOCKET so workers share one embedding model.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+_llm_slots = None
+_doc_cache = None
+
+
+# ---------- INPUT ----------
+def load_manifest(path):
+    docs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            doc = json.loads(line) if line.startswith("{") else {"path": line}
+            doc.setdefault("id", doc["path"])
+            docs.append(doc)
+    return docs
+
+
+def load_questions(path):
+    if path is None:
+        return []
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return list(json.load(f))
+        return [q.strip() for q in f if q.strip()]
+
+
+# ---------- CHECKPOINT ----------
+def completed_ids(out_path):
+    """Ids already answered, after truncating any half-written trailing line."""
+    if not os.path.exists(out_path):
+        return set()
+    done = set()
+    with open(out_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+
+# ---------- WORKER ----------
+def _init_worker(llm_slots):
+    global _llm_slots, _doc_cache
+    from doc_cache import DocCache
+    _llm_slots = llm_slots
+    _doc_cache = DocCache()
+
+
+def answer_document(doc, questions, top_k, temperature, max_tokens):
+    from backend import build_document, create_lexical_index, generate_answer, retrieve
+    from context import pack_context
+
+    started = time.perf_counter()
+    with open(doc["path"], "rb") as f:
+        data = f.read()
+    # Documents are already spread over processes; extract each one serially.
+    _, chunks, index, _ = build_document(data, cache=_doc_cache, workers=1)
+    lexical = create_lexical_index(chunks)
+    answers = []
+    for question in questions:
+        context = pack_context(retrieve(question, chunks, index, None, k=top_k, lexical=lexical))
+        with _llm_slots:
+            answer = generate_answer(question, context, [], temperature, max_tokens)
+        answers.append({"question": question, "answer": answer})
+    return {"id": doc["id"], "path": doc["path"], "chunks": len(chunks), "answers": answers,
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+# ---------- DRIVER ----------
+def run(docs, questions, out_path, workers, llm_concurrency, top_k=5, temperature=0.2, max_tokens=1024):
+    done = completed_ids(out_path)
+    todo = [d for d in docs if d["id"] not in done]
+    print(f"{len(docs)} documents, {len(done)} already done, {len(todo)} to go", file=sys.stderr)
+
+    ctx = mp.get_context("spawn")
+    llm_slots = ctx.BoundedSemaphore(llm_concurrency)
+    started = time.perf_counter()
+    n_docs = n_questions = n_failed = 0
+    with open(out_path, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                initializer=_init_worker, initargs=(llm_slots,)) as pool:
+        futures = {
+            pool.submit(answer_document, doc, questions + doc.get("questions", []),
+                        top_k, temperature, max_tokens): doc
+            for doc in todo
+        }
+        for future in as_completed(futures):
+            doc = futures[future]
+            try:
+                record = future.result()
+                n_docs += 1
+                n_questions += len(record["answers"])
+            except Exception as e:
+                record = {"id": doc["id"], "path": doc["path"], "error": f"{type(e).__name__}: {e}"}
+                n_failed += 1
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            minutes = (time.perf_counter() - started) / 60
+            print(f"[{n_docs + n_failed}/{len(todo)}] {doc['id']} · "
+                  f"{n_docs / minutes:.1f} docs/min · {n_questions / minutes:.1f} questions/min",
+                  file=sys.stderr)
+
+    minutes = max((time.perf_counter() - started) / 60, 1e-9)
+    summary = {"docs": n_docs, "failed": n_failed, "questions": n_questions,
+               "docs_per_min": round(n_docs / minutes, 2), "questions_per_min": round(n_questions / minutes, 2)}
+    print(json.dumps(summary), file=sys.stderr)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a fixed question set over many PDFs.")
+    parser.add_argument("manifest", help="one PDF path or JSON object per line")
+    parser.add_argument("--questions", help="questions file: one per line, or a .json list")
+    parser.add_argument("--out", default="results.jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="max LLM calls in flight across all workers")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--temperature", type=float, default=0.2)
+    parser.add_argument("--max-tokens", type=int, default=1024)
+    args = parser.parse_args()
+
+    docs = load_manifest(args.manifest)
+    questions = load_questions(args.questions)
+    if not questions and not any(d.get("questions") for d in docs):
+        parser.error("no questions: pass --questions or add them to the manifest")
+    run(docs, questions, args.out, args.workers, args.llm_concurrency,
+        args.top_k, args.temperature, args.max_tokens)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""Reproducible performance benchmarks for the ingest, retrieval and answer paths.
+
+    python bench.py --pages 20,200 --out bench_results.json
+    python bench.py --out bench_baseline.json                # record a baseline on this machine first
+    python bench.py --baseline bench_baseline.json           # then fail on regressions against it
+
+Timings only compare on the same machine, so no baseline ships with the
+repo; both files are gitignored.
+
+Documents are synthetic PDFs generated in-process, and answers stream from
+mock_llm_server at a fixed token rate, so runs need no network access.
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import numpy as np
+import backend
+from backend import (
+    build_messages, chunk_text, embed_texts,
+    CHUNK_SIZE, CHUNK_OVERLAP, create_lexical_index, retrieve,
+)
+from chunking import chunk_pages
+from context import pack_context
+from extract import iter_pages
+from indexes import build_index, set_search_params, to_index_space
+
+REGRESSION_TOLERANCE = 0.10
+# Timing differences smaller than this are scheduler noise, not regressions.
+NOISE_FLOOR_MS = 1.0
+
+_WORDS = ("agreement party payment invoice clause term notice liability warranty report revenue "
+          "quarter growth customer service delivery schedule budget risk audit policy employee "
+          "section schedule annex obligation confidential data security review approval").split()
+
+
+# ---------- SYNTHETIC PDFS ----------
+def synthetic_pages(n_pages, words_per_page, seed=0):
+    """Deterministic prose with sentences, paragraphs and clause-style identifiers."""
+    rng = random.Random(seed)
+    pages = []
+    for p in range(n_pages):
+        lines, words = [], 0
+        while words < words_per_page:
+            n = rng.randint(6, 18)
+            sentence = " ".join(rng.choice(_WORDS) for _ in range(n))
+            lines.append(f"Clause {p + 1}.{len(lines) + 1}: {sentence.capitalize()}.")
+            words += n + 2
+            if rng.random() < 0.2:
+                lines.append("")
+        pages.append("\n".join(lines))
+    return pages
+
+
+def _pdf_string(s):
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", "replace")
+
+
+def make_pdf(pages):
+    """Minimal multi-page PDF with one Helvetica text line per input line."""
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pages_id = 2 + 2 * len(pages)
+    kids = []
+    for text in pages:
+        ops = b" ".join(b"(" + _pdf_string(line) + b") '" for line in text.split("\n"))
+        stream = b"BT /F1 9 Tf 40 770 Td 11 TL " + ops + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 1 0 R >> >> /Contents %d 0 R >>" % (pages_id, len(objects)))
+        kids.append(len(objects))
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids)))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (n, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    return bytes(out)
+
+
+# ---------- TIMING ----------
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def percentiles(samples_s):
+    ms = np.asarray(samples_s) * 1000
+    return {f"p{q}_ms": round(float(np.percentile(ms, q)), 3) for q in (50, 95, 99)}
+
+
+def best_of(repeats, fn, *args, **kwargs):
+    """Run fn `repeats` times; return the last result and the fastest wall time."""
+    best = float("inf")
+    for _ in range(repeats):
+        result, elapsed = timed(fn, *args, **kwargs)
+        best = min(best, elapsed)
+    return result, best
+
+
+# ---------- STAGES ----------
+def bench_document(n_pages, args):
+    pages = synthetic_pages(n_pages, args.words_per_page, seed=n_pages)
+    data = make_pdf(pages)
+    out = {"pdf_bytes": len(data)}
+
+    # No page cache: every repeat (and every run) must time real extraction.
+    extracted, t = best_of(args.repeats, lambda: list(iter_pages(data, cache=None)))
+    out["extract_s"] = round(t, 4)
+    out["extract_pages_per_s"] = round(n_pages / t, 1)
+
+    text = "\n".join(page for _, page in extracted if page)
+    legacy, t = best_of(args.repeats, chunk_text, text, CHUNK_SIZE, CHUNK_OVERLAP)
+    out["chunk_fixed_s"] = round(t, 4)
+    out["chunk_fixed_count"] = len(legacy)
+    chunks, t = best_of(args.repeats, chunk_pages, extracted)
+    out["chunk_structured_s"] = round(t, 4)
+    out["chunk_structured_count"] = len(chunks)
+
+    embed_texts(list(chunks[:8]))  # warm-up: model load and first-batch overhead
+    embeddings, t = timed(embed_texts, list(chunks))
+    out["embed_s"] = round(t, 4)
+    out["embed_chunks_per_s"] = round(len(chunks) / t, 1)
+
+    rng = np.random.default_rng(0)
+    queries = synthetic_queries(args.queries, rng)
+    q_vectors = embed_texts(queries)
+    for kind in args.kinds:
+        if kind.startswith("ivf") and len(embeddings) < 1024:
+            continue  # too few vectors to train centroids meaningfully
+        index, t = timed(build_index, embeddings, kind=kind)
+        out[f"index_{kind}_build_s"] = round(t, 4)
+        set_search_params(index)
+        for k in args.k:
+            samples = []
+            for q in q_vectors:
+                q = to_index_space(index, q[None, :])
+                _, t = timed(index.search, q, k)
+                samples.append(t)
+            for name, value in percentiles(samples).items():
+                out[f"search_{kind}_k{k}_{name}"] = value
+
+    out.update(bench_answer(chunks, embeddings, queries, args))
+    return out
+
+
+def synthetic_queries(n, rng):
+    return [f"What does clause {rng.integers(1, 50)}.{rng.integers(1, 9)} say about "
+            f"{_WORDS[rng.integers(len(_WORDS))]}?" for _ in range(n)]
+
+
+def bench_answer(chunks, embeddings, queries, args):
+    """End-to-end: retrieve → pack → prompt → first/last token from a rate-limited mock LLM."""
+    from llm_gateway import LLMGateway, get_loop, stream_sync
+    from mock_llm_server import MockLLMServer
+
+    mock = MockLLMServer(ttft=args.llm_ttft, tokens_per_sec=args.llm_rate, max_tokens=args.llm_tokens, seed=0)
+    server = asyncio.run_coroutine_threadsafe(mock.start(), get_loop()).result()
+    port = server.sockets[0].getsockname()[1]
+    gateway = LLMGateway(base_url=f"http://127.0.0.1:{port}/v1", api_key="bench",
+                         rate=1e6, burst=1_000_000, hedge_after=None)
+    index = build_index(embeddings)
+    lexical = create_lexical_index(chunks)
+
+    def payload(messages):
+        return {"model": "mock", "messages": messages, "max_tokens": args.llm_tokens}
+
+    retrieval, ttft, total = [], [], []
+    try:
+        for _ in stream_sync(payload([{"role": "user", "content": "warm up"}]), gateway=gateway):
+            pass  # opens the pooled connection outside the timed loop
+        for query in queries[:args.answers]:
+            # Cold query-embedding and result caches, so repeated queries time the real work.
+            backend._query_embeddings.clear()
+            backend._results.clear()
+            t0 = time.perf_counter()
+            context = pack_context(retrieve(query, chunks, index, embeddings, k=5, lexical=lexical))
+            messages = build_messages(query, context, [])
+            retrieval.append(time.perf_counter() - t0)
+            first = None
+            for _ in stream_sync(payload(messages), gateway=gateway):
+                if first is None:
+                    first = time.perf_counter() - t0
+            ttft.append(first)
+            total.append(time.perf_counter() - t0)
+    finally:
+        server.close()
+    out = {}
+    for label, samples in (("retrieve_pack", retrieval), ("answer_ttft", ttft), ("answer_total", total)):
+        for name, value in percentiles(samples).items():
+            out[f"{label}_{name}"] = value
+    return out
+
+
+# ---------- BASELINE ----------
+def lower_is_better(metric):
+    return metric.endswith(("_s", "_ms"))
+
+
+def higher_is_better(metric):
+    return metric.endswith("_per_s")
+
+
+def _delta_ms(metrics, base_metrics, metric):
+    """Absolute change in milliseconds behind a metric (throughputs use their stage's time)."""
+    if higher_is_better(metric):
+        metric = metric.split("_", 1)[0] + "_s"
+    scale = 1 if metric.endswith("_ms") else 1000
+    return abs(metrics.get(metric, 0) - base_metrics.get(metric, 0)) * scale
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE, noise_floor_ms=NOISE_FLOOR_MS):
+    """List (doc, metric, baseline, current, change) for every metric that got worse by more than tolerance."""
+    regressions = []
+    for doc, metrics in results["documents"].items():
+        base_metrics = baseline.get("documents", {}).get(doc, {})
+        for metric, value in metrics.items():
+            base = base_metrics.get(metric)
+            if not base or _delta_ms(metrics, base_metrics, metric) < noise_floor_ms:
+                continue
+            change = (value - base) / base
+            if (lower_is_better(metric) and change > tolerance) or (higher_is_better(metric) and -change > tolerance):
+                regressions.append((doc, metric, base, value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocuMind performance benchmarks.")
+    parser.add_argument("--pages", default="20,200", help="comma-separated page counts")
+    parser.add_argument("--words-per-page", type=int, default=400, help="text density")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", default="1,5,10,20")
+    parser.add_argument("--kinds", default="flat_ip,hnsw,ivf")
+    parser.add_argument("--answers", type=int, default=20, help="end-to-end answers per document")
+    parser.add_argument("--llm-ttft", type=float, default=0.2)
+    parser.add_argument("--llm-rate", type=float, default=200.0, help="mock LLM tokens per second")
+    parser.add_argument("--llm-tokens", type=int, default=100)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--noise-floor-ms", type=float, default=NOISE_FLOOR_MS)
+    args = parser.parse_args()
+    args.k = [int(k) for k in args.k.split(",")]
+    args.kinds = args.kinds.split(",")
+
+    results = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                 "words_per_page": args.words_per_page, "created": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "documents": {},
+    }
+    for n_pages in (int(p) for p in args.pages.split(",")):
+        print(f"benchmarking {n_pages}-page document…", file=sys.stderr)
+        results["documents"][f"{n_pages}p"] = bench_document(n_pages, args)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results["documents"], indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.noise_floor_ms)
+        for doc, metric, base, value, change in regressions:
+            print(f"REGRESSION {doc} {metric}: {base} → {value} ({change:+.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("no regressions against baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
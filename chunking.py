@@ -0,0 +1,188 @@
+import re
+from bisect import bisect_right
+import numpy as np
+from context import CHARS_PER_TOKEN
+
+CHUNK_TOKENS = 200
+
+_PARAGRAPH = re.compile(r"\n[ \t]*\n\s*")
+_SENTENCE = re.compile(r"[.!?…][\"'”’)\]]*\s+")
+_SPACE = re.compile(r"\s*")
+
+
+# ---------- BUFFER ----------
+class TextBuffer:
+    """Append-only text held as page-sized segments until frozen into one string.
+
+    Slicing only touches the segments a span covers, so chunks can be read
+    while the document is still streaming in.
+    """
+
+    def __init__(self, text=None):
+        self._len = 0
+        self._segments = ([], [])
+        self._text = None
+        if text is not None:
+            self.append(text)
+            self.freeze()
+
+    def __len__(self):
+        return self._len
+
+    def append(self, s):
+        parts, offsets = self._segments
+        parts.append(s)
+        offsets.append(self._len)
+        self._len += len(s)
+
+    def slice(self, start, end):
+        text = self._text
+        if text is not None:
+            return text[start:end]
+        parts, offsets = self._segments
+        i = bisect_right(offsets, start) - 1
+        pieces = []
+        while start < end and i < len(parts):
+            base = offsets[i]
+            pieces.append(parts[i][start - base:end - base])
+            start = base + len(parts[i])
+            i += 1
+        return "".join(pieces)
+
+    def freeze(self):
+        if self._text is None:
+            self._text = "".join(self._segments[0])
+            self._segments = ([self._text], [0])
+        return self._text
+
+
+# ---------- CHUNKS ----------
+class Chunk(str):
+    """A chunk's text that remembers its position in its ChunkStore, so neighbours can be rejoined."""
+
+    def __new__(cls, text, position):
+        self = super().__new__(cls, text)
+        self.position = position
+        return self
+
+    def __getnewargs__(self):
+        return str(self), self.position
+
+
+class ChunkStore:
+    """Sequence of chunks stored as (start, end, first_page, last_page) spans into one buffer.
+
+    Behaves like a list of strings for retrieval; each item is sliced out on
+    access, as a Chunk that knows its position.
+    """
+
+    def __init__(self, buffer, spans=None):
+        self.buffer = buffer if isinstance(buffer, TextBuffer) else TextBuffer(buffer)
+        self._spans = [tuple(int(v) for v in s) for s in spans] if spans is not None else []
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self._spans)
+        start, end = self._spans[i][:2]
+        return Chunk(self.buffer.slice(start, end), i)
+
+    def __iter__(self):
+        for i in range(len(self._spans)):
+            yield self[i]
+
+    def extend(self, spans):
+        self._spans.extend(spans)
+
+    def span(self, i):
+        return self._spans[i]
+
+    @property
+    def spans(self):
+        return np.asarray(self._spans, dtype=np.int64).reshape(-1, 4)
+
+
+# ---------- CHUNKER ----------
+def _last_boundary(bounds, lo, hi):
+    i = int(np.searchsorted(bounds, hi, side="right")) - 1
+    if i >= 0 and bounds[i] >= lo:
+        return int(bounds[i])
+    return None
+
+
+class StructuredChunker:
+    """Incrementally split a page stream on paragraph, then sentence, boundaries.
+
+    Chunks never overlap and hold at most max_tokens. Paragraph breaks win
+    when they fall in the back half of a window, then sentence ends, then
+    whitespace; a hard cut only happens inside an unbroken run of text.
+    """
+
+    def __init__(self, max_tokens=CHUNK_TOKENS):
+        self.max_chars = max_tokens * CHARS_PER_TOKEN
+        self.min_chars = self.max_chars // 4
+        self.buffer = TextBuffer()
+        self._page_starts = []
+        self._page_nos = []
+        self._pos = 0
+
+    def feed(self, page_no, text):
+        """Add one page; returns the spans that are now complete."""
+        if not text:
+            return []
+        if len(self.buffer):
+            self.buffer.append("\n")  # page separator, as in read_pdf
+        self._page_starts.append(len(self.buffer))
+        self._page_nos.append(page_no)
+        self.buffer.append(text)
+        return self._drain(final=False)
+
+    def finish(self):
+        spans = self._drain(final=True)
+        self.buffer.freeze()
+        return spans
+
+    def _page_of(self, offset):
+        return self._page_nos[bisect_right(self._page_starts, offset) - 1]
+
+    def _drain(self, final):
+        base = self._pos
+        pending = self.buffer.slice(base, len(self.buffer))
+        paras = np.fromiter((m.end() for m in _PARAGRAPH.finditer(pending)), dtype=np.int64)
+        sents = np.fromiter((m.end() for m in _SENTENCE.finditer(pending)), dtype=np.int64)
+
+        spans = []
+        pos = 0
+        while True:
+            pos = _SPACE.match(pending, pos).end()
+            if pos >= len(pending) or (len(pending) - pos <= self.max_chars and not final):
+                break
+            limit = pos + self.max_chars
+            if len(pending) <= limit:
+                cut = len(pending)
+            else:
+                cut = (_last_boundary(paras, pos + self.max_chars // 2, limit)
+                       or _last_boundary(sents, pos + self.min_chars, limit))
+                if cut is None:
+                    space = pending.rfind(" ", pos + self.min_chars, limit)
+                    cut = space + 1 if space != -1 else limit
+            end = len(pending[pos:cut].rstrip()) + pos
+            start_abs, end_abs = base + pos, base + end
+            spans.append((start_abs, end_abs, self._page_of(start_abs), self._page_of(end_abs - 1)))
+            pos = cut
+        self._pos = base + pos
+        return spans
+
+
+def chunk_pages(pages, max_tokens=CHUNK_TOKENS):
+    """Chunk a whole (page_number, text) stream into a ChunkStore."""
+    chunker = StructuredChunker(max_tokens)
+    store = ChunkStore(chunker.buffer)
+    for page_no, text in pages:
+        store.extend(chunker.feed(page_no, text))
+    store.extend(chunker.finish())
+    return store
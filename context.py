@@ -0,0 +1,156 @@
+import re
+import zlib
+import numpy as np
+
+# Llama-family tokenizers average roughly four characters of English per token.
+CHARS_PER_TOKEN = 4
+CONTEXT_TOKEN_BUDGET = 3000
+HISTORY_TOKEN_BUDGET = 1500
+SUMMARY_TOKEN_BUDGET = 200
+SUMMARY_HEADER = "Summary of earlier conversation:\n"
+
+SEPARATOR = "\n\n---\n\n"
+DUPLICATE_THRESHOLD = 0.9
+SHINGLE_BUCKETS = 4096
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+# ---------- MERGING ----------
+def merge_adjacent(chunks):
+    """Join chunks that are neighbours in the document into single passages, keeping rank order.
+
+    Chunks from a ChunkStore carry their position; each run of consecutive ones
+    becomes one passage at the rank of its best member. Plain strings pass through.
+    """
+    chunks = list(chunks)
+    rank = {c.position: r for r, c in reversed(list(enumerate(chunks))) if getattr(c, "position", None) is not None}
+    passages = []
+    done = set()
+    for chunk in chunks:
+        i = getattr(chunk, "position", None)
+        if i is None:
+            passages.append(chunk)
+            continue
+        if i in done:
+            continue
+        lo, hi = i, i
+        while lo - 1 in rank:
+            lo -= 1
+        while hi + 1 in rank:
+            hi += 1
+        done.update(range(lo, hi + 1))
+        # Chunks are split at whitespace, which the join stands in for.
+        passages.append("\n".join(chunks[rank[j]] for j in range(lo, hi + 1)))
+    return passages
+
+
+# ---------- DEDUPLICATION ----------
+def _shingle_matrix(texts):
+    """Binary hashed word-trigram vectors, L2-normalized, one row per text."""
+    m = np.zeros((len(texts), SHINGLE_BUCKETS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = _WORD.findall(text.lower())
+        grams = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+        m[row, [zlib.crc32(g.encode()) % SHINGLE_BUCKETS for g in grams]] = 1.0
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return m / np.where(norms == 0, 1.0, norms)
+
+
+def drop_near_duplicates(passages, threshold=DUPLICATE_THRESHOLD):
+    if len(passages) < 2:
+        return list(passages)
+    m = _shingle_matrix(passages)
+    sim = m @ m.T
+    kept = []
+    for i in range(len(passages)):
+        if not kept or sim[i, kept].max() < threshold:
+            kept.append(i)
+    return [passages[i] for i in kept]
+
+
+# ---------- PACKING ----------
+def truncate_to_tokens(text, budget):
+    """Cut text to a token budget, preferring to stop at a sentence boundary."""
+    limit = budget * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    ends = [m.start() for m in _SENTENCE_END.finditer(cut)]
+    if ends and ends[-1] > limit // 2:
+        cut = cut[:ends[-1]]
+    return cut.rstrip() + " …"
+
+
+def pack_context(chunks, budget=CONTEXT_TOKEN_BUDGET, separator=SEPARATOR):
+    """Best-first chunks → one context string within a token budget.
+
+    Adjacent chunks are stitched together and near-duplicates dropped
+    before anything is spent against the budget.
+    """
+    passages = drop_near_duplicates(merge_adjacent(chunks))
+    sep_tokens = estimate_tokens(separator)
+    packed = []
+    remaining = budget
+    for passage in passages:
+        cost = estimate_tokens(passage) + (sep_tokens if packed else 0)
+        if cost <= remaining:
+            packed.append(passage)
+            remaining -= cost
+            continue
+        # Fill what is left with the head of the next passage, if it is worth it.
+        if remaining - sep_tokens >= 64:
+            packed.append(truncate_to_tokens(passage, remaining - sep_tokens))
+        break
+    return separator.join(packed)
+
+
+# ---------- HISTORY ----------
+def summarize_turns(turns, budget=SUMMARY_TOKEN_BUDGET, previous=""):
+    """Extractive digest of older turns: the first sentence of each, newest kept last.
+
+    `previous` is an earlier digest to extend, for summaries that roll forward.
+    """
+    lines = previous.split("\n") if previous else []
+    for role, content in turns:
+        first = _SENTENCE_END.split(content.strip(), 1)[0]
+        lines.append(f"- {role}: {truncate_to_tokens(first, 40)}")
+    digest = "\n".join(lines)
+    while lines and estimate_tokens(digest) > budget:
+        lines.pop(0)
+        digest = "\n".join(lines)
+    return digest
+
+
+def trim_history(history, budget=HISTORY_TOKEN_BUDGET, summary=""):
+    """Newest turns verbatim within the budget; anything older condensed into one summary turn.
+
+    `summary` is a digest of turns before `history`, folded into that turn.
+    History that is already trimmed (leading summary turn) comes back unchanged
+    if it fits, so trimming twice never re-summarises the summary.
+    """
+    if history and history[0][0] == "system" and history[0][1].startswith(SUMMARY_HEADER):
+        earlier = history[0][1][len(SUMMARY_HEADER):]
+        summary = f"{summary}\n{earlier}" if summary else earlier
+        history = history[1:]
+    kept = []
+    remaining = budget - SUMMARY_TOKEN_BUDGET
+    cut = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        cost = estimate_tokens(history[i][1])
+        if cost > remaining:
+            break
+        kept.append(history[i])
+        remaining -= cost
+        cut = i
+    kept.reverse()
+    older = history[:cut]
+    if not older and not summary:
+        return kept
+    summary = summarize_turns(older, SUMMARY_TOKEN_BUDGET + remaining, previous=summary)
+    return [("system", SUMMARY_HEADER + summary)] + kept
@@ -0,0 +1,112 @@
+"""Disk-backed chat history with a bounded in-memory window.
+
+Every turn is appended to a JSONL log under CONVERSATION_DIR. Only the last
+RECENT_TURNS stay in memory; older ones are folded into a rolling extractive
+summary, which is logged too. Reopening a conversation streams the log once,
+keeping only the latest summary and the turns after it, so memory stays
+bounded however long the log; nothing re-reads it after that.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import threading
+from collections import deque
+from context import HISTORY_TOKEN_BUDGET, SUMMARY_TOKEN_BUDGET, summarize_turns, trim_history
+from doc_cache import CACHE_DIR
+
+CONVERSATION_DIR = os.path.join(CACHE_DIR, ".conversations")
+# Turns kept verbatim in memory; anything older lives in the log and the summary.
+RECENT_TURNS = int(os.getenv("DOCUMIND_RECENT_TURNS", "16"))
+# Turns kept for display; the chat view shows only the tail of long conversations.
+DISPLAY_TURNS = int(os.getenv("DOCUMIND_DISPLAY_TURNS", "100"))
+
+_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class Conversation:
+    """One chat session: recent turns in memory, the full transcript in an append-only log."""
+
+    def __init__(self, conversation_id=None, root=CONVERSATION_DIR, recent=RECENT_TURNS,
+                 summary_budget=SUMMARY_TOKEN_BUDGET, display=DISPLAY_TURNS):
+        # The id may come from a URL, so it never gets to pick an arbitrary path.
+        if conversation_id is None or not _ID.fullmatch(conversation_id):
+            conversation_id = uuid.uuid4().hex
+        self.id = conversation_id
+        self.path = os.path.join(root, f"{conversation_id}.jsonl")
+        self.summary_budget = summary_budget
+        self.summary = ""
+        self.counts = {}
+        self._recent = deque()
+        self._shown = deque(maxlen=display)
+        self._window = recent
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def _records(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write.
+                        continue
+        except FileNotFoundError:
+            return
+
+    def _load(self):
+        for record in self._records():
+            if "summary" in record:
+                self.summary = record["summary"]
+                for _ in range(min(record["turns"], len(self._recent))):
+                    self._recent.popleft()
+            else:
+                self._recent.append((record["role"], record["content"]))
+                self._shown.append((record["role"], record["content"]))
+                self.counts[record["role"]] = self.counts.get(record["role"], 0) + 1
+
+    def _write(self, record):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    # ---------- WRITE ----------
+    def append(self, role, content):
+        with self._lock:
+            self._write({"role": role, "content": content, "ts": time.time()})
+            self._recent.append((role, content))
+            self._shown.append((role, content))
+            self.counts[role] = self.counts.get(role, 0) + 1
+            if len(self._recent) > self._window:
+                # Fold the older half at once so the summary isn't rewritten every turn.
+                evicted = [self._recent.popleft() for _ in range(len(self._recent) - self._window // 2)]
+                self.summary = summarize_turns(evicted, self.summary_budget, previous=self.summary)
+                self._write({"summary": self.summary, "turns": len(evicted)})
+
+    def clear(self):
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self._recent.clear()
+            self._shown.clear()
+            self.counts = {}
+            self.summary = ""
+
+    # ---------- READ ----------
+    def history(self, budget=HISTORY_TOKEN_BUDGET):
+        """Prompt-ready turns within `budget` tokens: a summary turn, then the newest turns verbatim."""
+        with self._lock:
+            turns, summary = list(self._recent), self.summary
+        return trim_history(turns, budget, summary=summary)
+
+    def transcript(self):
+        """The last `display` turns, oldest first; the log is read once, when the conversation loads."""
+        with self._lock:
+            return list(self._shown)
@@ -0,0 +1,243 @@
+import os
+import io
+import json
+import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
+from backend import embed_texts, read_pdf_pages
+from chunking import chunk_pages
+from indexes import HNSW_M, EF_SEARCH, normalize
+
+SHARD_SIZE = 100_000
+
+Hit = namedtuple("Hit", "score doc_id doc_name page start end text")
+
+_COLUMNS = {"doc_ids": np.int32, "pages": np.int32, "last_pages": np.int32, "starts": np.int64, "ends": np.int64}
+_TEXTS = "texts"
+
+
+class Corpus:
+    """Many documents in one searchable store.
+
+    Vectors live in fixed-size shards of ID-mapped FAISS indexes; vector id N
+    is row N of a columnar metadata table (doc id, first/last page, char
+    start/end), so filters are resolved with NumPy and pushed into FAISS as
+    ID selectors.
+    """
+
+    def __init__(self, shard_size=SHARD_SIZE, kind="flat_ip"):
+        self.shard_size = shard_size
+        self.kind = kind
+        self.shards = []
+        self.doc_names = []
+        self.doc_texts = []
+        # (path, documents whose text is already there), so saves only write new texts.
+        self._saved_texts = (None, 0)
+        self._n = 0
+        self._columns = {c: np.empty(1024, dtype=t) for c, t in _COLUMNS.items()}
+
+    def __len__(self):
+        return self._n
+
+    # Column views over the live rows; capacity grows by doubling.
+    doc_ids = property(lambda self: self._columns["doc_ids"][:self._n])
+    pages = property(lambda self: self._columns["pages"][:self._n])
+    last_pages = property(lambda self: self._columns["last_pages"][:self._n])
+    starts = property(lambda self: self._columns["starts"][:self._n])
+    ends = property(lambda self: self._columns["ends"][:self._n])
+
+    def _append_rows(self, **values):
+        n_new = len(next(iter(values.values())))
+        need = self._n + n_new
+        for c, col in self._columns.items():
+            if need > len(col):
+                grown = np.empty(max(need, 2 * len(col)), dtype=col.dtype)
+                grown[:self._n] = col[:self._n]
+                self._columns[c] = col = grown
+            col[self._n:need] = values[c]
+        self._n = need
+
+    # ---------- WRITE ----------
+    def add_document(self, name, pages):
+        """Append a document given as (page_number, text) pairs; returns its doc id."""
+        chunks = chunk_pages(pages)
+        if not len(chunks):
+            raise ValueError(f"Could not extract text from {name}. The PDF may be image-only.")
+        text = chunks.buffer.freeze()
+        spans = chunks.spans
+        vectors = normalize(embed_texts(list(chunks)))
+
+        doc_id = len(self.doc_names)
+        self.doc_names.append(name)
+        self.doc_texts.append(text)
+        first_id = len(self)
+        self._append_rows(doc_ids=np.full(len(spans), doc_id), pages=spans[:, 2], last_pages=spans[:, 3],
+                          starts=spans[:, 0], ends=spans[:, 1])
+        self._add_vectors(first_id, vectors)
+        return doc_id
+
+    def add_pdf(self, name, data):
+        return self.add_document(name, read_pdf_pages(io.BytesIO(data)))
+
+    def _new_shard(self, dim):
+        if self.kind == "hnsw":
+            base = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            base.hnsw.efSearch = EF_SEARCH
+        else:
+            base = faiss.IndexFlatIP(dim)
+        return faiss.IndexIDMap2(base)
+
+    def _add_vectors(self, first_id, vectors):
+        ids = np.arange(first_id, first_id + len(vectors), dtype=np.int64)
+        while len(ids):
+            shard_no = int(ids[0]) // self.shard_size
+            if shard_no == len(self.shards):
+                self.shards.append(self._new_shard(vectors.shape[1]))
+            take = int(np.searchsorted(ids, (shard_no + 1) * self.shard_size))
+            self.shards[shard_no].add_with_ids(vectors[:take], ids[:take])
+            ids, vectors = ids[take:], vectors[take:]
+
+    # ---------- READ ----------
+    def select(self, doc_ids=None, pages=None):
+        """Vector ids matching the filters, or None when unfiltered."""
+        if doc_ids is None and pages is None:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        if doc_ids is not None:
+            mask &= np.isin(self.doc_ids, np.asarray(list(doc_ids), dtype=np.int32))
+        if pages is not None:
+            lo, hi = pages
+            # Chunks that run across a page break match a range touching any of their pages.
+            mask &= (self.pages <= hi) & (self.last_pages >= lo)
+        return np.flatnonzero(mask).astype(np.int64)
+
+    def retrieve(self, query, k=5, doc_ids=None, pages=None):
+        """Top-k chunks across the corpus as scored Hits, optionally restricted to
+        some doc ids and an inclusive (first, last) page range."""
+        if not self.shards:
+            return []
+        q = normalize(embed_texts([query]))
+        allowed = self.select(doc_ids, pages)
+        if allowed is not None and not len(allowed):
+            return []
+
+        def search(shard_no):
+            shard = self.shards[shard_no]
+            k_shard = min(k, shard.ntotal)
+            if allowed is None:
+                return shard.search(q, k_shard)
+            lo, hi = shard_no * self.shard_size, (shard_no + 1) * self.shard_size
+            ids = allowed[np.searchsorted(allowed, lo):np.searchsorted(allowed, hi)]
+            if not len(ids):
+                return None
+            sel = faiss.IDSelectorBatch(ids)
+            return shard.search(q, min(k_shard, len(ids)), params=faiss.SearchParameters(sel=sel))
+
+        # FAISS releases the GIL, so shards are scanned concurrently.
+        with ThreadPoolExecutor(max_workers=min(len(self.shards), os.cpu_count() or 1)) as pool:
+            results = [r for r in pool.map(search, range(len(self.shards))) if r is not None]
+        if not results:
+            return []
+        scores = np.concatenate([d[0] for d, _ in results])
+        ids = np.concatenate([i[0] for _, i in results])
+        keep = ids >= 0
+        scores, ids = scores[keep], ids[keep]
+        order = np.argsort(-scores)[:k]
+        return [self._hit(int(ids[o]), float(scores[o])) for o in order]
+
+    def _hit(self, vid, score):
+        doc_id = int(self.doc_ids[vid])
+        start, end = int(self.starts[vid]), int(self.ends[vid])
+        return Hit(score, doc_id, self.doc_names[doc_id], int(self.pages[vid]), start, end,
+                   self.doc_texts[doc_id][start:end])
+
+    # ---------- PERSISTENCE ----------
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for n, shard in enumerate(self.shards):
+            faiss.write_index(shard, os.path.join(path, f"shard-{n:05d}.faiss"))
+        np.savez(os.path.join(path, "meta.npz"), **{c: getattr(self, c) for c in _COLUMNS})
+        # Documents are append-only, so each text file is written once per save location.
+        os.makedirs(os.path.join(path, _TEXTS), exist_ok=True)
+        saved_path, n_saved = self._saved_texts
+        first = n_saved if saved_path == os.path.abspath(path) else 0
+        for doc_id in range(first, len(self.doc_texts)):
+            text_path = os.path.join(path, _TEXTS, f"{doc_id:06d}.txt")
+            with open(text_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(self.doc_texts[doc_id])
+            os.replace(text_path + ".tmp", text_path)
+        self._saved_texts = (os.path.abspath(path), len(self.doc_texts))
+        with open(os.path.join(path, "docs.json"), "w", encoding="utf-8") as f:
+            json.dump({"shard_size": self.shard_size, "kind": self.kind, "names": self.doc_names}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "docs.json"), encoding="utf-8") as f:
+            docs = json.load(f)
+        corpus = cls(shard_size=docs["shard_size"], kind=docs["kind"])
+        corpus.doc_names = docs["names"]
+        if "texts" in docs:
+            corpus.doc_texts = docs["texts"]  # saved before texts moved to one file per document
+        else:
+            corpus.doc_texts = []
+            for doc_id in range(len(corpus.doc_names)):
+                with open(os.path.join(path, _TEXTS, f"{doc_id:06d}.txt"), encoding="utf-8") as f:
+                    corpus.doc_texts.append(f.read())
+        meta = dict(np.load(os.path.join(path, "meta.npz")))
+        meta.setdefault("last_pages", meta["pages"])
+        corpus._append_rows(**{c: meta[c] for c in _COLUMNS})
+        if "texts" not in docs:
+            corpus._saved_texts = (os.path.abspath(path), len(corpus.doc_texts))
+        shard_files = sorted(f for f in os.listdir(path) if f.startswith("shard-"))
+        corpus.shards = [faiss.read_index(os.path.join(path, f)) for f in shard_files]
+        return corpus
+
+
+# ---------- CLI ----------
+def _page_range(value):
+    first, _, last = value.partition("-")
+    return int(first), int(last or first)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query a multi-document DocuMind corpus.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    build = sub.add_parser("build", help="index every PDF in a directory")
+    build.add_argument("pdf_dir")
+    build.add_argument("out")
+    build.add_argument("--kind", choices=("flat_ip", "hnsw"), default="flat_ip")
+    query = sub.add_parser("query", help="search a saved corpus")
+    query.add_argument("corpus")
+    query.add_argument("question")
+    query.add_argument("-k", type=int, default=5)
+    query.add_argument("--doc", action="append", help="restrict to this document name (repeatable)")
+    query.add_argument("--pages", type=_page_range, help="restrict to a page range such as 3-10")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        corpus = Corpus(kind=args.kind)
+        for name in sorted(os.listdir(args.pdf_dir)):
+            if not name.lower().endswith(".pdf"):
+                continue
+            with open(os.path.join(args.pdf_dir, name), "rb") as f:
+                try:
+                    corpus.add_pdf(name, f.read())
+                except ValueError as e:
+                    print(f"skipped: {e}")
+        corpus.save(args.out)
+        print(f"{len(corpus.doc_names)} documents, {len(corpus)} chunks → {args.out}")
+    else:
+        corpus = Corpus.load(args.corpus)
+        doc_ids = None
+        if args.doc:
+            doc_ids = [i for i, name in enumerate(corpus.doc_names) if name in set(args.doc)]
+        for hit in corpus.retrieve(args.question, k=args.k, doc_ids=doc_ids, pages=args.pages):
+            print(f"[{hit.score:.3f}] {hit.doc_name} p.{hit.page} ({hit.start}-{hit.end})")
+            print(hit.text.replace("\n", " ")[:300])
+            print()
+
+
+if __name__ == "__main__":
+    main()
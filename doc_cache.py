@@ -0,0 +1,128 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import faiss
+import numpy as np
+from chunking import ChunkStore
+
+CACHE_DIR = os.getenv("DOCUMIND_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "documind"))
+CACHE_MAX_BYTES = int(os.getenv("DOCUMIND_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+_CHUNKS = "chunks.json"
+_SPANS = "spans.npy"
+_TEXT = "text.txt"
+_EMBEDS = "embeddings.npy"
+_INDEX = "index.faiss"
+_STAMP = ".last_used"
+
+
+# ---------- KEYS ----------
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(data, *params):
+    """Key a document by its bytes plus every setting that changes its chunks, vectors or index."""
+    params = ":".join(str(p) for p in params).encode()
+    return f"{content_hash(data)[:32]}-{hashlib.sha256(params).hexdigest()[:16]}"
+
+
+# ---------- DISK CACHE ----------
+class DocCache:
+    """Content-addressed store of chunks, embeddings and FAISS indexes with LRU eviction by size."""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        path = self._path(key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            with open(os.path.join(path, _TEXT), encoding="utf-8") as f:
+                text = f.read()
+            if os.path.exists(os.path.join(path, _SPANS)):
+                chunks = ChunkStore(text, np.load(os.path.join(path, _SPANS)))
+            else:
+                with open(os.path.join(path, _CHUNKS), encoding="utf-8") as f:
+                    chunks = json.load(f)
+            embeds = os.path.join(path, _EMBEDS)
+            # Absent for revisions built incrementally; the index holds the vectors.
+            embeddings = np.load(embeds, mmap_mode="r") if os.path.exists(embeds) else None
+            index = _read_index(os.path.join(path, _INDEX))
+        except (OSError, ValueError, RuntimeError):
+            # Half-written or corrupted entry — drop it and rebuild.
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        _touch(os.path.join(path, _STAMP))
+        return text, chunks, index, embeddings
+
+    def put(self, key, text, chunks, index, embeddings):
+        path = self._path(key)
+        if os.path.isdir(path):
+            return
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            if isinstance(chunks, ChunkStore):
+                # Spans into text.txt — chunk text is never stored twice.
+                np.save(os.path.join(tmp, _SPANS), chunks.spans)
+            else:
+                with open(os.path.join(tmp, _CHUNKS), "w", encoding="utf-8") as f:
+                    json.dump(list(chunks), f)
+            with open(os.path.join(tmp, _TEXT), "w", encoding="utf-8") as f:
+                f.write(text)
+            if embeddings is not None:
+                np.save(os.path.join(tmp, _EMBEDS), np.ascontiguousarray(embeddings, dtype=np.float32))
+            faiss.write_index(index, os.path.join(tmp, _INDEX))
+            _touch(os.path.join(tmp, _STAMP))
+            os.rename(tmp, path)
+        except OSError:
+            # Another process won the race for this key, or the disk is full.
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            path = self._path(name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            size = _dir_size(path)
+            try:
+                last_used = os.path.getmtime(os.path.join(path, _STAMP))
+            except OSError:
+                last_used = 0.0
+            entries.append((last_used, size, path))
+            total += size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def _read_index(path):
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # Not every index type supports mmap; fall back to a regular load.
+        return faiss.read_index(path)
+
+
+def _touch(path):
+    with open(path, "a"):
+        os.utime(path, None)
+
+
+def _dir_size(path):
+    return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
@@ -0,0 +1,193 @@
+"""Shared embedding worker.
+
+One process holds the SentenceTransformer and serves every app process over
+a Unix socket, folding concurrent `encode` requests into single forward passes.
+
+    python embed_server.py --socket /tmp/documind-embed.sock
+    DOCUMIND_EMBED_SOCKET=/tmp/documind-embed.sock streamlit run ui.py
+
+Wire format, both directions: a 4-byte big-endian length, then that many
+bytes of JSON. A reply header {"shape": [n, dim]} is followed by n * dim
+float32 values; {"error": "..."} is followed by nothing.
+"""
+import os
+import json
+import socket
+import struct
+import asyncio
+import argparse
+import threading
+import numpy as np
+
+DEFAULT_SOCKET = "/tmp/documind-embed.sock"
+MAX_BATCH = 256
+MAX_WAIT_MS = 5.0
+
+_LEN = struct.Struct("!I")
+
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        r = sock.recv_into(view[got:])
+        if not r:
+            raise ConnectionError("embedding server closed the connection")
+        got += r
+    return bytes(buf)
+
+
+# ---------- CLIENT ----------
+class RemoteEncoder:
+    """Drop-in for SentenceTransformer.encode backed by the shared worker; one connection per thread."""
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _drop(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        body = json.dumps({"texts": [texts] if single else list(texts)}).encode()
+        for attempt in range(2):
+            try:
+                sock = self._conn()
+                sock.sendall(_LEN.pack(len(body)) + body)
+                (n,) = _LEN.unpack(_recv_exact(sock, _LEN.size))
+                header = json.loads(_recv_exact(sock, n))
+                if "error" in header:
+                    raise RuntimeError(f"embedding server: {header['error']}")
+                rows, dim = header["shape"]
+                data = _recv_exact(sock, rows * dim * 4)
+                break
+            except OSError:
+                # Stale connection (e.g. the server restarted) — retry once on a fresh one.
+                self._drop()
+                if attempt:
+                    raise
+        vectors = np.frombuffer(data, dtype=np.float32).reshape(rows, dim)
+        return vectors[0] if single else vectors
+
+    def ping(self):
+        self.encode([])
+        return True
+
+
+# ---------- SERVER ----------
+class EmbedServer:
+    def __init__(self, model, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.dim = model.get_sentence_embedding_dimension()
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+
+    def _encode(self, texts):
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.atleast_2d(np.asarray(self.model.encode(texts), dtype=np.float32))
+
+    async def batcher(self):
+        """Collect requests for up to max_wait (or max_batch texts), then run one forward pass."""
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            total = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while total < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                items.append(item)
+                total += len(item[0])
+
+            texts = [t for batch, _ in items for t in batch]
+            try:
+                vectors = await loop.run_in_executor(None, self._encode, texts)
+            except Exception as e:
+                for _, fut in items:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            offset = 0
+            for batch, fut in items:
+                if not fut.done():
+                    fut.set_result(vectors[offset:offset + len(batch)])
+                offset += len(batch)
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    (n,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+                    request = json.loads(await reader.readexactly(n))
+                except asyncio.IncompleteReadError:
+                    break
+                fut = loop.create_future()
+                await self.queue.put((request.get("texts", []), fut))
+                try:
+                    vectors = await fut
+                    header, payload = {"shape": list(vectors.shape)}, np.ascontiguousarray(vectors).tobytes()
+                except Exception as e:
+                    header, payload = {"error": str(e)}, b""
+                header = json.dumps(header).encode()
+                writer.write(_LEN.pack(len(header)) + header + payload)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, path):
+        self.queue = asyncio.Queue()
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.handle, path=path)
+        os.chmod(path, 0o600)
+        batcher = asyncio.create_task(self.batcher())
+        print(f"DocuMind embedding server listening on {path}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared DocuMind embedding worker.")
+    parser.add_argument("--socket", default=os.getenv("DOCUMIND_EMBED_SOCKET") or DEFAULT_SOCKET)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    from backend import EMBED_MODEL
+
+    server = EmbedServer(SentenceTransformer(EMBED_MODEL), args.max_batch, args.max_wait_ms)
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import io
+import os
+import hashlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import pypdf
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+from doc_cache import CACHE_DIR
+
+PAGE_CACHE_DIR = os.path.join(CACHE_DIR, ".pages")
+PAGE_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+# Below this many pages the pool start-up costs more than it saves.
+MIN_PARALLEL_PAGES = 8
+PAGES_PER_TASK = 4
+
+
+# ---------- PAGE CACHE ----------
+class PageCache:
+    """On-disk page text cache keyed by a hash of everything that determines each page's text."""
+
+    def __init__(self, root=PAGE_CACHE_DIR, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key + ".txt")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, text):
+        tmp = self._path(key) + f".{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            return
+
+    def evict(self):
+        entries = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(self.root) if e.is_file()]
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+# Back-pointers up the page tree; following them would hash the whole document.
+_SKIP_KEYS = {"/Parent", "/P"}
+
+
+def _digest(obj, memo, active):
+    """SHA-1 over a PDF object graph, memoized per indirect object (fonts are shared across pages)."""
+    ref = None
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        if ref in memo:
+            return memo[ref]
+        if ref in active:
+            return b"cycle"
+        active.add(ref)
+        obj = obj.get_object()
+    h = hashlib.sha1(type(obj).__name__.encode())
+    if isinstance(obj, DictionaryObject):
+        # Image pixels never affect extracted text; their dictionary is enough.
+        if isinstance(obj, StreamObject) and obj.get("/Subtype") != "/Image":
+            h.update(obj.get_data())
+        for key in sorted(obj):
+            if key not in _SKIP_KEYS:
+                h.update(key.encode())
+                h.update(_digest(obj.raw_get(key), memo, active))
+    elif isinstance(obj, ArrayObject):
+        for item in obj:
+            h.update(_digest(item, memo, active))
+    else:
+        h.update(repr(obj).encode())
+    digest = h.digest()
+    if ref is not None:
+        active.discard(ref)
+        memo[ref] = digest
+    return digest
+
+
+def page_key(page, memo=None):
+    """Key for a page's extracted text: its content plus resources (fonts, ToUnicode maps,
+    form XObjects) and the pypdf version that extracts it."""
+    digest = _digest(page, {} if memo is None else memo, set())
+    return hashlib.sha1(pypdf.__version__.encode() + digest).hexdigest()
+
+
+# ---------- WORKERS ----------
+_reader = None
+
+
+def _init_worker(data):
+    global _reader
+    _reader = PdfReader(io.BytesIO(data))
+
+
+def _extract_pages(page_numbers):
+    return [_reader.pages[i].extract_text() or "" for i in page_numbers]
+
+
+# ---------- STREAMING EXTRACTION ----------
+def iter_pages(data, workers=None, cache=None):
+    """Yield (page_number, text) in page order, extracting each page exactly once.
+
+    Pages are fanned out across a process pool and yielded as soon as every
+    earlier page is done. Page numbers are 1-based.
+    """
+    reader = PdfReader(io.BytesIO(data))
+    n_pages = len(reader.pages)
+    memo = {}
+    keys = [page_key(p, memo) for p in reader.pages] if cache is not None else [None] * n_pages
+    cached = [cache.get(k) if cache is not None else None for k in keys]
+    todo = [i for i in range(n_pages) if cached[i] is None]
+
+    if len(todo) < MIN_PARALLEL_PAGES or workers == 1:
+        for i in range(n_pages):
+            text = cached[i]
+            if text is None:
+                text = reader.pages[i].extract_text() or ""
+                if cache is not None:
+                    cache.put(keys[i], text)
+            yield i + 1, text
+    else:
+        workers = workers or min(os.cpu_count() or 1, len(todo) // PAGES_PER_TASK + 1)
+        # Spawned, not forked: ingest calls this from a thread while others run torch.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(data,)) as pool:
+            batches = [todo[j:j + PAGES_PER_TASK] for j in range(0, len(todo), PAGES_PER_TASK)]
+            futures = {batch[0]: (batch, pool.submit(_extract_pages, batch)) for batch in batches}
+            for i in range(n_pages):
+                if cached[i] is None and i in futures:
+                    batch, future = futures.pop(i)
+                    for page_no, text in zip(batch, future.result()):
+                        cached[page_no] = text
+                        if cache is not None:
+                            cache.put(keys[page_no], text)
+                yield i + 1, cached[i]
+                cached[i] = None
+
+    if cache is not None:
+        cache.evict()
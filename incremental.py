@@ -0,0 +1,91 @@
+"""Re-index a revised document, embedding only the chunks whose text changed.
+
+Chunks are matched across revisions by a hash of their text. Vectors of
+matched chunks are carried over from the previous revision's index; vectors
+of chunks that disappeared are removed with remove_ids, and only new or
+edited chunks go through the embedding model. Unchanged pages are not
+re-extracted either, thanks to extract.PageCache.
+"""
+import hashlib
+import faiss
+import numpy as np
+from indexes import build_index, to_index_space
+
+
+def chunk_hashes(chunks):
+    """64-bit content hash of every chunk."""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(c.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+         for c in chunks),
+        dtype=np.int64, count=len(chunks),
+    )
+
+
+def match_chunks(old_hashes, new_hashes):
+    """For each new chunk, the old position with identical text, or -1 if it must be embedded.
+
+    Every old vector is reused at most once, so repeated boilerplate chunks
+    beyond the old count are embedded afresh.
+    """
+    positions = {}
+    for i, h in enumerate(old_hashes.tolist()):
+        positions.setdefault(h, []).append(i)
+    reuse = np.full(len(new_hashes), -1, dtype=np.int64)
+    for j, h in enumerate(new_hashes.tolist()):
+        free = positions.get(h)
+        if free:
+            reuse[j] = free.pop(0)
+    return reuse
+
+
+def _updatable_in_place(index):
+    # Flat-code storages compact in order on remove_ids, which keeps the id map aligned.
+    return isinstance(index, faiss.IndexIDMap) and isinstance(faiss.downcast_index(index.index), faiss.IndexFlatCodes)
+
+
+def stored_vectors(index):
+    """Decode every vector an index holds, ordered by id (chunk position)."""
+    labels = np.arange(index.ntotal)
+    if isinstance(index, faiss.IndexIDMap):
+        labels = faiss.vector_to_array(index.id_map)
+        index = faiss.downcast_index(index.index)
+    if faiss.try_extract_index_ivf(index) is not None:
+        # IVF needs a direct map to reconstruct; build it on a copy, not the live index.
+        index = faiss.clone_index(index)
+        faiss.extract_index_ivf(index).make_direct_map()
+    vectors = index.reconstruct_n(0, index.ntotal)
+    out = np.empty_like(vectors)
+    out[labels] = vectors
+    return out
+
+
+def revise_index(index, reuse, texts, embed, **build_kwargs):
+    """Index for the new chunk list `texts` (ids = positions), derived from the previous revision's index.
+
+    `reuse` comes from match_chunks and `embed` maps a list of texts to
+    vectors. The previous index is never modified. Returns the new index and
+    the number of chunks embedded.
+    """
+    fresh = np.flatnonzero(reuse < 0)
+    kept = np.flatnonzero(reuse >= 0)
+    vectors = embed([texts[j] for j in fresh]) if len(fresh) else None
+
+    if _updatable_in_place(index):
+        index = faiss.clone_index(index)
+        new_label = np.full(index.ntotal, -1, dtype=np.int64)
+        new_label[reuse[kept]] = kept
+        stale = np.flatnonzero(new_label < 0)
+        if len(stale):
+            index.remove_ids(stale)
+        faiss.copy_array_to_vector(new_label[faiss.vector_to_array(index.id_map)], index.id_map)
+        if vectors is not None:
+            index.add_with_ids(to_index_space(index, vectors), fresh)
+        return index, len(fresh)
+
+    # Graph, IVF and rescoring indexes can't drop vectors in place: rebuild from decoded ones.
+    old = stored_vectors(index)
+    merged = np.empty((len(texts), old.shape[1]), dtype=np.float32)
+    merged[kept] = old[reuse[kept]]
+    if vectors is not None:
+        merged[fresh] = to_index_space(index, vectors)
+    return build_index(merged, ids=np.arange(len(texts)), **build_kwargs), len(fresh)
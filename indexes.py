@@ -0,0 +1,275 @@
+import sys
+import time
+import math
+import faiss
+import numpy as np
+
+INDEX_KINDS = ("flat", "flat_ip", "hnsw", "ivf", "ivfpq")
+# How the index stores each vector: 4, 2 or 1 byte per dimension, or PQ codes.
+STORAGES = ("float32", "fp16", "int8", "pq")
+# Finer codes kept alongside coarse ones so top candidates can be rescored.
+RESCORE_CODECS = {"int8": "fp16", "pq": "int8"}
+RESCORE_FACTOR = 4
+
+# Below this many vectors a brute-force scan is already sub-millisecond.
+FLAT_MAX_VECTORS = 20_000
+# Above this many vectors HNSW graph build time and link memory stop paying off.
+HNSW_MAX_VECTORS = 1_000_000
+
+NPROBE = 16
+EF_SEARCH = 64
+EF_CONSTRUCTION = 80
+HNSW_M = 32
+PQ_BITS = 8
+TRAIN_POINTS_PER_CENTROID = 64
+
+
+# ---------- VECTORS ----------
+def normalize(x):
+    x = np.array(x, dtype=np.float32, copy=True, order="C")
+    faiss.normalize_L2(x)
+    return x
+
+
+def to_index_space(index, x):
+    """Normalize vectors for inner-product indexes so IP equals cosine similarity."""
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return normalize(x)
+    return np.ascontiguousarray(x, dtype=np.float32)
+
+
+# ---------- SELECTION ----------
+def code_bytes(storage, dim):
+    """Bytes one vector takes in the given storage."""
+    if storage == "pq":
+        return _pq_subquantizers(dim) * PQ_BITS // 8
+    return dim * {"float32": 4, "fp16": 2, "int8": 1}[storage]
+
+
+def estimate_bytes(kind, n, dim, storage="float32", rescore=0):
+    if kind == "ivfpq":
+        storage = "pq"
+    per_vector = code_bytes(storage, dim)
+    if rescore and kind != "ivfpq" and storage in RESCORE_CODECS:
+        per_vector += code_bytes(RESCORE_CODECS[storage], dim)
+    if kind == "hnsw":
+        per_vector += HNSW_M * 2 * 4
+    return n * per_vector
+
+
+def choose_index_kind(n, dim, memory_budget=None, storage="float32", rescore=0):
+    """Pick the cheapest backend that keeps recall high for n vectors within a memory budget (bytes)."""
+    fits = lambda kind: memory_budget is None or estimate_bytes(kind, n, dim, storage, rescore) <= memory_budget
+    if n <= FLAT_MAX_VECTORS and fits("flat_ip"):
+        return "flat_ip"
+    # FAISS only builds HNSW over PQ codes with an L2 metric.
+    if n <= HNSW_MAX_VECTORS and storage != "pq" and fits("hnsw"):
+        return "hnsw"
+    if fits("ivf"):
+        return "ivf"
+    return "ivfpq"
+
+
+def _pq_subquantizers(dim):
+    # Aim for ~8 dimensions per sub-quantizer; m must divide dim.
+    m = max(1, dim // 8)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def _nlist(n):
+    return max(1, min(int(4 * math.sqrt(n)), n // TRAIN_POINTS_PER_CENTROID or 1))
+
+
+def _codec(storage, dim):
+    # "np": skip polysemous training, which only helps Hamming-filtered search and costs ~60x the build time.
+    return {"fp16": "SQfp16", "int8": "SQ8", "pq": f"PQ{_pq_subquantizers(dim)}x{PQ_BITS}np"}[storage]
+
+
+def _factory_string(kind, storage, n, dim, rescore):
+    if kind == "ivfpq":
+        kind, storage = "ivf", "pq"
+    if kind in ("flat", "flat_ip"):
+        description = _codec(storage, dim)
+    elif kind == "hnsw":
+        description = f"HNSW{HNSW_M},{_codec(storage, dim)}"
+    else:
+        description = f"IVF{_nlist(n)},{_codec(storage, dim)}"
+    if rescore and storage in RESCORE_CODECS:
+        description += f",Refine({_codec(RESCORE_CODECS[storage], dim)})"
+    return description
+
+
+# ---------- FACTORY ----------
+def check_index_config(kind, storage):
+    """Raise ValueError for an index kind / vector storage pair build_index can't serve."""
+    if kind != "auto" and kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind {kind!r}; expected one of {INDEX_KINDS} or 'auto'.")
+    if storage not in STORAGES:
+        raise ValueError(f"Unknown vector storage {storage!r}; expected one of {STORAGES}.")
+    # FAISS only builds HNSW over PQ codes with an L2 metric.
+    if kind == "hnsw" and storage == "pq":
+        raise ValueError("PQ storage is not supported with HNSW; use kind='ivfpq'.")
+
+
+def build_index(embeddings, kind="auto", memory_budget=None, nprobe=NPROBE, ef_search=EF_SEARCH, seed=0,
+                storage="float32", rescore=0, ids=None):
+    """Build and fill a FAISS index over `embeddings`.
+
+    All kinds except "flat" use inner product on L2-normalized vectors. IVF
+    kinds and quantized storage are trained on a random sample of the data.
+    With storage other than float32 the index holds only compressed codes;
+    rescore > 0 also keeps finer codes and re-ranks rescore * k candidates
+    per query with them. Passing `ids` wraps the index in an IndexIDMap so
+    vectors can later be removed or relabelled by id.
+    """
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    n, dim = embeddings.shape
+    check_index_config(kind, storage)
+    if kind == "auto":
+        kind = choose_index_kind(n, dim, memory_budget, storage, rescore)
+    if n < 2 ** PQ_BITS:
+        # Too few vectors to train PQ centroids: fall back to 8-bit scalar codes.
+        if kind == "ivfpq":
+            kind, storage = "ivf", "int8"
+        elif storage == "pq":
+            storage = "int8"
+
+    if storage != "float32":
+        metric = faiss.METRIC_L2 if kind == "flat" else faiss.METRIC_INNER_PRODUCT
+        index = faiss.index_factory(dim, _factory_string(kind, storage, n, dim, rescore), metric)
+        if kind == "hnsw":
+            _base_index(index).hnsw.efConstruction = EF_CONSTRUCTION
+    elif kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "flat_ip":
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = EF_CONSTRUCTION
+    else:
+        nlist = _nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if kind == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subquantizers(dim), PQ_BITS, faiss.METRIC_INNER_PRODUCT)
+
+    vectors = to_index_space(index, embeddings)
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        ivf = faiss.try_extract_index_ivf(index)
+        n_train = min(n, max(ivf.nlist if ivf is not None else 1, 2 ** PQ_BITS) * TRAIN_POINTS_PER_CENTROID)
+        sample = vectors[np.sort(rng.choice(n, n_train, replace=False))]
+        index.train(sample)
+    if ids is not None:
+        index = faiss.IndexIDMap(index)
+        index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+    else:
+        index.add(vectors)
+    set_search_params(index, nprobe=nprobe, ef_search=ef_search, rescore=rescore or None)
+    return index
+
+
+def _unwrap_ids(index):
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def _base_index(index):
+    """The ANN index inside any id map and rescoring wrapper."""
+    index = _unwrap_ids(index)
+    if isinstance(index, faiss.IndexRefine):
+        return faiss.downcast_index(index.base_index)
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None, rescore=None):
+    """Trade recall for latency: nprobe for IVF kinds, efSearch for HNSW, rescore candidates per result."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and nprobe is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    base = _base_index(index)
+    if hasattr(base, "hnsw") and ef_search is not None:
+        base.hnsw.efSearch = ef_search
+    refine = _unwrap_ids(index)
+    if isinstance(refine, faiss.IndexRefine) and rescore is not None:
+        refine.k_factor = float(rescore)
+    return index
+
+
+# ---------- RECALL REPORT ----------
+DEFAULT_SWEEP = {
+    "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128, 256)],
+    "ivf": [{"nprobe": p} for p in (1, 4, 16, 64)],
+    "ivfpq": [{"nprobe": p} for p in (1, 4, 16, 64)],
+    # "kind:storage" entries measure quantized storage; rescore=1 means no extra candidates.
+    "flat_ip:fp16": [{}],
+    "flat_ip:int8": [{"rescore": 1}, {"rescore": RESCORE_FACTOR}],
+    "ivf:pq": [{"nprobe": 16, "rescore": r} for r in (1, RESCORE_FACTOR, 16)],
+}
+
+
+def recall_report(embeddings, queries, k=10, sweep=DEFAULT_SWEEP):
+    """Measure recall@k and mean query latency of each backend against exact search."""
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    queries = normalize(np.atleast_2d(queries))
+    k = min(k, len(embeddings))
+
+    exact = build_index(embeddings, kind="flat_ip")
+    rows = [_measure("flat_ip", {}, exact, queries, k, None)]
+    truth = rows[0].pop("_ids")
+    for name, settings in sweep.items():
+        kind, _, storage = name.partition(":")
+        t0 = time.perf_counter()
+        index = build_index(embeddings, kind=kind, storage=storage or "float32", rescore=RESCORE_FACTOR)
+        build_s = time.perf_counter() - t0
+        for params in settings:
+            set_search_params(index, **params)
+            row = _measure(name, params, index, queries, k, truth)
+            row["build_s"] = round(build_s, 3)
+            rows.append(row)
+    return rows
+
+
+def _index_bytes(index):
+    return faiss.serialize_index(index).nbytes
+
+
+def _measure(kind, params, index, queries, k, truth):
+    t0 = time.perf_counter()
+    _, ids = index.search(queries, k)
+    latency_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+    row = {"kind": kind, **params, "latency_ms": round(latency_ms, 4),
+           "bytes_per_vector": round(_index_bytes(index) / index.ntotal, 1)}
+    if truth is None:
+        row["recall"] = 1.0
+        row["_ids"] = ids
+    else:
+        hits = sum(len(np.intersect1d(a, b)) for a, b in zip(ids, truth))
+        row["recall"] = round(hits / truth.size, 4)
+    return row
+
+
+def format_report(rows):
+    lines = [f"{'kind':<14} {'params':<22} {'recall':>7} {'ms/query':>9} {'bytes/vec':>9}"]
+    for row in rows:
+        params = ", ".join(f"{k}={row[k]}" for k in ("nprobe", "ef_search", "rescore") if k in row)
+        lines.append(f"{row['kind']:<14} {params:<22} {row['recall']:>7.4f} {row['latency_ms']:>9.4f} "
+                     f"{row['bytes_per_vector']:>9}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # python indexes.py embeddings.npy [n_queries] [k]
+    data = np.load(sys.argv[1], mmap_mode="r")
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(data), min(n_queries, len(data)), replace=False)
+    # Perturb held-in vectors so queries are near, but not on, the data.
+    q = np.asarray(data[np.sort(picks)], dtype=np.float32)
+    q += rng.normal(scale=0.05, size=q.shape).astype(np.float32)
+    print(format_report(recall_report(data, q, k=k)))
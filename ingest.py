@@ -0,0 +1,236 @@
+import io
+import queue
+import threading
+import numpy as np
+import metrics
+from backend import (
+    INDEX_KIND, INDEX_MEMORY_BUDGET, VECTOR_RESCORE, VECTOR_STORAGE,
+    create_lexical_index, document_key, embed_texts, read_pdf_pages, retrieve,
+)
+from chunking import ChunkStore, StructuredChunker, chunk_pages
+from incremental import chunk_hashes, match_chunks, revise_index
+from indexes import build_index, choose_index_kind, to_index_space
+
+EMBED_BATCH_SIZE = 64
+QUEUE_SIZE = 8
+
+_DONE = object()
+
+
+class IngestPipeline:
+    """Extract → chunk → embed, overlapped across threads with bounded queues between stages.
+
+    The FAISS index grows batch by batch, so `retrieve` answers over the pages
+    indexed so far while later pages are still being extracted. Growth uses an
+    exact index; once ingest finishes it is swapped for the configured ANN
+    backend and vector storage if those differ. The finished index is the
+    only in-memory copy of the vectors; its ids are chunk positions.
+
+    Given a finished `base` pipeline for an earlier revision of the same
+    document, only chunks whose text changed are embedded (see incremental.py).
+    """
+
+    def __init__(self, data, cache=None, batch_size=EMBED_BATCH_SIZE, queue_size=QUEUE_SIZE, workers=None,
+                 base=None):
+        # Handed to the extract thread on start and dropped with it, not kept for the pipeline's life.
+        self._data = data
+        self.cache = cache
+        self.base = base if base is not None and base.done and base.error is None else None
+        self.batch_size = batch_size
+        self.workers = workers
+        self.key = document_key(data)
+
+        self.text = ""
+        self._chunker = StructuredChunker()
+        self.chunks = ChunkStore(self._chunker.buffer)
+        self.index = None
+        self.lexical = None
+        self.pages_done = 0
+        self.error = None
+
+        self._pages = queue.Queue(maxsize=queue_size)
+        self._batches = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._failed = threading.Event()
+        self._done = threading.Event()
+        self._threads = []
+
+    # ---------- STATE ----------
+    @property
+    def ready(self):
+        """True once at least one batch of chunks is searchable."""
+        return self.index is not None and self.index.ntotal > 0
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self
+
+    # ---------- CONTROL ----------
+    def start(self):
+        data, self._data = self._data, None
+        if self.cache is not None:
+            hit = self.cache.get(self.key)
+            metrics.incr("doc_cache_hits" if hit is not None else "doc_cache_misses")
+            if hit is not None:
+                self.text, self.chunks, self.index, _ = hit
+                self.lexical = create_lexical_index(self.chunks)
+                self._done.set()
+                return self
+        if self.base is not None:
+            t = threading.Thread(target=self._revise, args=(data,), daemon=True)
+            t.start()
+            self._threads.append(t)
+            return self
+        for target, args in ((self._extract, (data,)), (self._chunk, ()), (self._embed, ())):
+            t = threading.Thread(target=target, args=args, daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def retrieve(self, query, k=5):
+        with self._lock:
+            if not self.ready:
+                return []
+            return retrieve(query, self.chunks, self.index, None, k=k, lexical=self.lexical)
+
+    # ---------- STAGES ----------
+    def _put(self, q, item):
+        while not self._failed.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._failed.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, e):
+        self.error = e
+        self._failed.set()
+        self._done.set()
+
+    def _extract(self, data):
+        try:
+            for page_no, text in read_pdf_pages(io.BytesIO(data), workers=self.workers):
+                self.pages_done += 1
+                if text and not self._put(self._pages, (page_no, text)):
+                    return
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(self._pages, _DONE)
+
+    def _chunk(self):
+        try:
+            batch = []
+            while True:
+                page = self._get(self._pages)
+                if page is _DONE:
+                    break
+                with metrics.span("chunk"):
+                    batch.extend(self._chunker.feed(*page))
+                while len(batch) >= self.batch_size:
+                    if not self._put(self._batches, batch[:self.batch_size]):
+                        return
+                    batch = batch[self.batch_size:]
+            if self._failed.is_set():
+                return
+            batch.extend(self._chunker.finish())
+            self.text = self._chunker.buffer.freeze()
+            for i in range(0, len(batch), self.batch_size):
+                self._put(self._batches, batch[i:i + self.batch_size])
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(self._batches, _DONE)
+
+    def _embed(self):
+        parts = []
+        try:
+            while True:
+                batch = self._get(self._batches)
+                if batch is _DONE or self._failed.is_set():
+                    break
+                vectors = embed_texts([self._chunker.buffer.slice(start, end) for start, end, _, _ in batch])
+                parts.append(vectors)
+                metrics.incr("chunks_embedded", len(vectors))
+                with self._lock:
+                    ids = np.arange(len(self.chunks), len(self.chunks) + len(vectors))
+                    if self.index is None:
+                        self.index = build_index(vectors, kind="flat_ip", ids=ids)
+                    else:
+                        self.index.add_with_ids(to_index_space(self.index, vectors), ids)
+                    self.chunks.extend(batch)
+            if self._failed.is_set():
+                return
+            if not parts:
+                raise ValueError("Could not extract text. The PDF may be image-only.")
+            embeddings = np.vstack(parts)
+            del parts[:]
+            self._finalize_index(embeddings)
+            self.lexical = create_lexical_index(self.chunks)
+            if self.cache is not None:
+                self.cache.put(self.key, self.text, self.chunks, self.index, embeddings)
+            self._done.set()
+        except Exception as e:
+            self._fail(e)
+
+    def _finalize_index(self, embeddings):
+        n, dim = embeddings.shape
+        kind = INDEX_KIND
+        if kind == "auto":
+            kind = choose_index_kind(n, dim, INDEX_MEMORY_BUDGET, VECTOR_STORAGE, VECTOR_RESCORE)
+        if kind == "flat_ip" and VECTOR_STORAGE == "float32":
+            return
+        with metrics.span("index_build"):
+            index = build_index(embeddings, kind=kind, memory_budget=INDEX_MEMORY_BUDGET,
+                                storage=VECTOR_STORAGE, rescore=VECTOR_RESCORE, ids=np.arange(n))
+        with self._lock:
+            self.index = index
+
+    def _revise(self, data):
+        """Ingest `data` as a revision of self.base: carry over vectors of unchanged chunks."""
+        try:
+            chunks = chunk_pages(self._count_pages(read_pdf_pages(io.BytesIO(data), workers=self.workers)))
+            if not len(chunks):
+                raise ValueError("Could not extract text. The PDF may be image-only.")
+            with self.base._lock:
+                old_chunks, old_index = self.base.chunks, self.base.index
+            reuse = match_chunks(chunk_hashes(old_chunks), chunk_hashes(chunks))
+            kind = INDEX_KIND
+            if kind == "auto":
+                kind = choose_index_kind(len(chunks), old_index.d, INDEX_MEMORY_BUDGET, VECTOR_STORAGE, VECTOR_RESCORE)
+            with metrics.span("index_build"):
+                index, n_embedded = revise_index(old_index, reuse, chunks, embed_texts, kind=kind,
+                                                 memory_budget=INDEX_MEMORY_BUDGET,
+                                                 storage=VECTOR_STORAGE, rescore=VECTOR_RESCORE)
+            metrics.incr("chunks_embedded", n_embedded)
+            metrics.incr("chunks_reused", len(chunks) - n_embedded)
+            lexical = create_lexical_index(chunks)
+            with self._lock:
+                self.text = chunks.buffer.freeze()
+                self.chunks, self.index, self.lexical = chunks, index, lexical
+            self.base = None
+            if self.cache is not None:
+                self.cache.put(self.key, self.text, self.chunks, self.index, None)
+            self._done.set()
+        except Exception as e:
+            self._fail(e)
+
+    def _count_pages(self, pages):
+        for page in pages:
+            self.pages_done += 1
+            yield page
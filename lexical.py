@@ -0,0 +1,78 @@
+import re
+import numpy as np
+
+# Words plus dotted/dashed identifiers such as "4.2.1", "ISO-27001" or "v2.0".
+TOKEN_RE = re.compile(r"\w+(?:[.\-/]\w+)*")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+# ---------- BM25 ----------
+class BM25Index:
+    """Array-backed inverted index with vectorized BM25 scoring.
+
+    Postings are stored CSR-style: the postings of term t are
+    docs[indptr[t]:indptr[t + 1]], with their precomputed BM25 weights in
+    weights[...] — a query is a gather plus one bincount.
+    """
+
+    def __init__(self, chunks, k1=BM25_K1, b=BM25_B):
+        self.vocab = {}
+        term_ids, lengths = [], []
+        for text in chunks:
+            ids = [self.vocab.setdefault(t, len(self.vocab)) for t in tokenize(text)]
+            term_ids.extend(ids)
+            lengths.append(len(ids))
+        self.n_docs = n_docs = len(lengths)
+        n_terms = len(self.vocab)
+        doc_len = np.asarray(lengths, dtype=np.float32)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        doc_ids = np.repeat(np.arange(n_docs, dtype=np.int64), lengths)
+
+        # One (term, doc) key per token; unique() both sorts by term and counts tf.
+        keys, tf = np.unique(term_ids * max(n_docs, 1) + doc_ids, return_counts=True)
+        post_terms = keys // max(n_docs, 1)
+        self.docs = (keys % max(n_docs, 1)).astype(np.int32)
+        self.indptr = np.searchsorted(post_terms, np.arange(n_terms + 1))
+
+        df = np.diff(self.indptr).astype(np.float32)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        avgdl = doc_len.mean() if n_docs else 1.0
+        tf = tf.astype(np.float32)
+        norm = k1 * (1 - b + b * doc_len[self.docs] / max(avgdl, 1e-9))
+        self.weights = (idf[post_terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+    def scores(self, query):
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids:
+            return np.zeros(self.n_docs, dtype=np.float32)
+        spans = [np.arange(self.indptr[t], self.indptr[t + 1]) for t in term_ids]
+        sel = np.concatenate(spans)
+        return np.bincount(self.docs[sel], weights=self.weights[sel], minlength=self.n_docs)
+
+    def search(self, query, k):
+        """Indices of the top-k chunks by BM25, best first; chunks with no matching terms are left out."""
+        scores = self.scores(query)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+
+# ---------- FUSION ----------
+def rrf_fuse(rankings, k=RRF_K, limit=None):
+    """Reciprocal-rank fusion of several best-first id lists."""
+    fused = {}
+    for ranking in rankings:
+        for rank, i in enumerate(ranking):
+            i = int(i)
+            fused[i] = fused.get(i, 0.0) + 1.0 / (k + rank + 1)
+    ordered = sorted(fused, key=fused.get, reverse=True)
+    return ordered[:limit] if limit is not None else ordered
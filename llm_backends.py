@@ -0,0 +1,148 @@
+"""Interchangeable chat-completion backends behind one streaming contract.
+
+Every backend has `stream(messages, temp, max_tokens)`, a blocking iterator
+of text deltas. DOCUMIND_LLM_BACKEND picks one per process:
+
+    groq       Groq's hosted API through its client (default)
+    gateway    the shared asyncio gateway (llm_gateway.py), any OpenAI-style endpoint
+    llama_cpp  a local GGUF model on CPU (pip install llama-cpp-python), DOCUMIND_LLM_MODEL_PATH
+    mock       deterministic in-process replies (mock_llm_server.py's), no network at all
+"""
+import os
+import time
+import threading
+
+MODEL = "llama-3.3-70b-versatile"
+# The older gateway switch still works when no backend is named.
+LLM_BACKEND = os.getenv("DOCUMIND_LLM_BACKEND", "gateway" if os.getenv("DOCUMIND_LLM_GATEWAY", "") == "1" else "groq")
+LOCAL_MODEL_PATH = os.getenv("DOCUMIND_LLM_MODEL_PATH", "")
+LOCAL_CONTEXT = int(os.getenv("DOCUMIND_LLM_CONTEXT", "8192"))
+LOCAL_THREADS = int(os.getenv("DOCUMIND_LLM_THREADS", "0")) or None
+# Unpaced by default, so load tests measure the pipeline rather than a simulated model.
+MOCK_TTFT_S = float(os.getenv("DOCUMIND_MOCK_TTFT_S", "0"))
+MOCK_TOKENS_PER_SEC = float(os.getenv("DOCUMIND_MOCK_TOKENS_PER_SEC", "0"))
+MOCK_MAX_TOKENS = int(os.getenv("DOCUMIND_MOCK_MAX_TOKENS", "256"))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            import httpx
+            from groq import Groq
+            _client = Groq(
+                api_key=os.getenv("GROQ_API_KEY"),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                max_retries=2,
+            )
+    return _client
+
+
+# ---------- BACKENDS ----------
+class GroqBackend:
+    def __init__(self, model=MODEL):
+        self.model = model
+
+    def stream(self, messages, temp, max_tokens):
+        stream = get_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temp,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        for chunk in stream:
+            content = chunk.choices[0].delta.content
+            if content:
+                yield content
+
+
+class GatewayBackend:
+    def __init__(self, model=MODEL, gateway=None):
+        self.model = model
+        self.gateway = gateway
+
+    def stream(self, messages, temp, max_tokens):
+        from llm_gateway import stream_sync
+        yield from stream_sync({
+            "model": self.model,
+            "messages": messages,
+            "temperature": temp,
+            "max_tokens": max_tokens,
+        }, gateway=self.gateway)
+
+
+class LlamaCppBackend:
+    """A quantized GGUF model run on CPU by llama-cpp-python, loaded on first use."""
+
+    def __init__(self, model_path=LOCAL_MODEL_PATH, n_ctx=LOCAL_CONTEXT, n_threads=LOCAL_THREADS):
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads
+        self._llm = None
+        # One llama.cpp context serves one generation at a time.
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._llm is None:
+            if not self.model_path:
+                raise ValueError("Set DOCUMIND_LLM_MODEL_PATH to a GGUF file to use the llama_cpp backend.")
+            try:
+                from llama_cpp import Llama
+            except ImportError as e:
+                raise ImportError("The llama_cpp backend needs llama-cpp-python: pip install llama-cpp-python") from e
+            self._llm = Llama(model_path=self.model_path, n_ctx=self.n_ctx, n_threads=self.n_threads,
+                              verbose=False)
+        return self._llm
+
+    def stream(self, messages, temp, max_tokens):
+        with self._lock:
+            chunks = self._load().create_chat_completion(
+                messages=messages, temperature=temp, max_tokens=max_tokens, stream=True,
+            )
+            for chunk in chunks:
+                content = chunk["choices"][0]["delta"].get("content")
+                if content:
+                    yield content
+
+
+class MockBackend:
+    """Deterministic replies with optional latency and throughput, for offline runs and load tests."""
+
+    def __init__(self, ttft=MOCK_TTFT_S, tokens_per_sec=MOCK_TOKENS_PER_SEC, max_tokens=MOCK_MAX_TOKENS):
+        from mock_llm_server import MockLLMServer
+        self._server = MockLLMServer(ttft=ttft, tokens_per_sec=tokens_per_sec, max_tokens=max_tokens)
+
+    def stream(self, messages, temp, max_tokens):
+        tokens = self._server.tokens_for({"messages": messages, "max_tokens": max_tokens})
+        if self._server.ttft:
+            time.sleep(self._server.ttft)
+        for token in tokens:
+            yield token
+            if self._server.tokens_per_sec:
+                time.sleep(1 / self._server.tokens_per_sec)
+
+
+BACKENDS = {
+    "groq": GroqBackend,
+    "gateway": GatewayBackend,
+    "llama_cpp": LlamaCppBackend,
+    "mock": MockBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name=None):
+    """The process-wide instance of backend `name` (default: DOCUMIND_LLM_BACKEND)."""
+    name = name or LLM_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend {name!r}; expected one of {tuple(BACKENDS)}.")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
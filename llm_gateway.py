@@ -0,0 +1,290 @@
+"""Process-wide asyncio gateway for streaming chat completions.
+
+Every Streamlit session funnels through one event loop and one pooled
+HTTP client, so upstream concurrency and request rate are enforced globally
+and queued rather than blocking session threads on their own sockets.
+"""
+import os
+import json
+import time
+import queue
+import random
+import asyncio
+import logging
+import threading
+import httpx
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+LLM_BASE_URL = os.getenv("DOCUMIND_LLM_BASE_URL", GROQ_BASE_URL)
+MAX_CONCURRENCY = int(os.getenv("DOCUMIND_LLM_CONCURRENCY", "16"))
+RATE_PER_SEC = float(os.getenv("DOCUMIND_LLM_RATE", "8"))
+RATE_BURST = int(os.getenv("DOCUMIND_LLM_BURST", "16"))
+DEADLINE_S = 60.0
+MAX_RETRIES = 3
+BACKOFF_BASE_S = 0.25
+BACKOFF_MAX_S = 4.0
+# Start a second attempt if the first has not produced a token by then (None disables).
+HEDGE_AFTER_S = float(os.getenv("DOCUMIND_LLM_HEDGE_S", "0")) or None
+
+_RETRY_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+log = logging.getLogger(__name__)
+
+
+class GatewayError(RuntimeError):
+    pass
+
+
+class _Retryable(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ---------- RATE LIMIT ----------
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# ---------- GATEWAY ----------
+class LLMGateway:
+    def __init__(self, base_url=LLM_BASE_URL, api_key=None, max_concurrency=MAX_CONCURRENCY,
+                 rate=RATE_PER_SEC, burst=RATE_BURST, max_retries=MAX_RETRIES, hedge_after=HEDGE_AFTER_S):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key if api_key is not None else os.getenv("GROQ_API_KEY", "")
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self.rate = rate
+        self.burst = burst
+        self.stats = {"requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "queued": 0, "in_flight": 0}
+        self._http = None
+        self._slots = None
+        self._bucket = None
+
+    def _ensure_started(self):
+        # Created lazily so they bind to the loop that actually runs requests.
+        if self._http is None:
+            http2 = _http2_available()
+            if not http2:
+                log.warning("h2 is not installed; LLM gateway falls back to HTTP/1.1 without multiplexing "
+                            "(pip install 'httpx[http2]')")
+            self._http = httpx.AsyncClient(
+                http2=http2,
+                timeout=httpx.Timeout(DEADLINE_S, connect=10.0),
+                limits=httpx.Limits(max_connections=self.max_concurrency * 2,
+                                    max_keepalive_connections=self.max_concurrency),
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._bucket = TokenBucket(self.rate, self.burst)
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def stream_chat(self, payload, deadline_s=DEADLINE_S):
+        """Yield content deltas for an OpenAI-style chat payload.
+
+        Failures before the first delta are retried with full-jitter backoff
+        while the deadline allows; once text has been yielded, errors propagate.
+        """
+        self._ensure_started()
+        deadline = time.monotonic() + deadline_s
+        payload = {**payload, "stream": True}
+        self.stats["requests"] += 1
+        yielded = False
+        for attempt in range(self.max_retries + 1):
+            try:
+                async for delta in self._hedged(payload, deadline):
+                    yielded = True
+                    yield delta
+                return
+            except _Retryable as e:
+                if yielded:
+                    # A retry would stream the whole answer again after the partial one.
+                    raise GatewayError(f"LLM stream interrupted after partial output: {e}") from e
+                delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt) * random.random()
+                if e.retry_after is not None:
+                    delay = max(delay, e.retry_after)
+                if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    raise GatewayError(f"LLM request failed after {attempt + 1} attempts: {e}") from e
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+
+    async def _hedged(self, payload, deadline):
+        """Race a backup attempt against a slow primary; the first to produce a token wins."""
+        streams = []
+        pending = {}
+
+        def launch():
+            stream = self._attempt(payload, deadline)
+            streams.append(stream)
+            pending[asyncio.ensure_future(stream.__anext__())] = stream
+
+        launch()
+        try:
+            while pending:
+                timeout = self.hedge_after if len(streams) == 1 else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.stats["hedges"] += 1
+                    launch()
+                    continue
+                task = done.pop()
+                winner = pending.pop(task)
+                try:
+                    first = task.result()
+                except StopAsyncIteration:
+                    return
+                except _Retryable:
+                    if pending:
+                        continue  # the other attempt may still succeed
+                    raise
+                await _cancel_all(pending)
+                if winner is not streams[0]:
+                    self.stats["hedge_wins"] += 1
+                yield first
+                async for delta in winner:
+                    yield delta
+                return
+        finally:
+            await _cancel_all(pending)
+            for stream in streams:
+                await stream.aclose()
+
+    async def _attempt(self, payload, deadline):
+        self.stats["queued"] += 1
+        queued = True
+        try:
+            async with self._slots:
+                self.stats["queued"] -= 1
+                queued = False
+                self.stats["in_flight"] += 1
+                try:
+                    await self._bucket.acquire()
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise GatewayError("LLM deadline exceeded while queued")
+                    timeout = httpx.Timeout(remaining, connect=min(10.0, remaining))
+                    async with self._http.stream("POST", f"{self.base_url}/chat/completions",
+                                                 json=payload, timeout=timeout) as response:
+                        if response.status_code in _RETRY_STATUS:
+                            retry_after = response.headers.get("retry-after", "")
+                            raise _Retryable(f"HTTP {response.status_code}",
+                                             float(retry_after) if retry_after.isdigit() else None)
+                        if response.status_code >= 400:
+                            body = (await response.aread()).decode(errors="replace")
+                            raise GatewayError(f"HTTP {response.status_code}: {body[:300]}")
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                return
+                            delta = json.loads(data)["choices"][0]["delta"].get("content")
+                            if delta:
+                                yield delta
+                finally:
+                    self.stats["in_flight"] -= 1
+        except httpx.TransportError as e:
+            raise _Retryable(repr(e)) from e
+        finally:
+            if queued:
+                self.stats["queued"] -= 1
+
+
+async def _cancel_all(tasks):
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    tasks.clear()
+
+
+# ---------- SYNC BRIDGE ----------
+_DONE = object()
+
+
+class _LoopThread:
+    """A single background event loop shared by every session in the process."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="llm-gateway", daemon=True)
+        self.thread.start()
+
+
+_loop_thread = None
+_gateway = None
+_init_lock = threading.Lock()
+
+
+def get_loop():
+    global _loop_thread
+    with _init_lock:
+        if _loop_thread is None:
+            _loop_thread = _LoopThread()
+    return _loop_thread.loop
+
+
+def get_gateway():
+    global _gateway
+    get_loop()
+    with _init_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+    return _gateway
+
+
+def stream_sync(payload, gateway=None, deadline_s=DEADLINE_S):
+    """Blocking generator over gateway.stream_chat, for sync callers such as Streamlit."""
+    gateway = gateway or get_gateway()
+    out = queue.Queue()
+
+    async def pump():
+        try:
+            async for delta in gateway.stream_chat(payload, deadline_s):
+                out.put(delta)
+        except BaseException as e:
+            out.put(e)
+        finally:
+            out.put(_DONE)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_loop())
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Consumer went away (e.g. the Streamlit run was stopped) — stop the upstream request too.
+        future.cancel()
@@ -0,0 +1,251 @@
+"""Per-request tracing and process-wide counters for the hot paths.
+
+    with metrics.trace("query") as t:
+        with metrics.span("retrieve"):
+            ...
+    t.breakdown()   # {"retrieve": 12.5, ...} in milliseconds
+
+Spans and counters always feed the process totals (render_prometheus, or
+serve() for a scrape endpoint) and, inside a trace, that request's
+breakdown. Finished traces are appended to DOCUMIND_METRICS_LOG as JSONL.
+DOCUMIND_METRICS=0 turns every call into a no-op.
+"""
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import nullcontext
+
+METRICS_ENABLED = os.getenv("DOCUMIND_METRICS", "1") != "0"
+METRICS_LOG = os.getenv("DOCUMIND_METRICS_LOG", "")
+METRICS_PORT = int(os.getenv("DOCUMIND_METRICS_PORT", "0"))
+
+_NULL = nullcontext()
+_current = contextvars.ContextVar("documind_trace", default=None)
+
+
+# ---------- TRACE ----------
+class Trace:
+    """Spans, counters and observations recorded for one request."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.seconds = None
+        self.spans = []
+        self.counters = {}
+        self.values = {}
+
+    def breakdown(self):
+        """Milliseconds per stage, summed over repeated spans, in completion order."""
+        out = {}
+        for name, seconds in self.spans:
+            out[name] = out.get(name, 0.0) + seconds * 1000
+        return out
+
+    def to_dict(self):
+        return {"trace": self.name, "started": round(self.started, 3),
+                "ms": round((self.seconds or 0) * 1000, 3),
+                "stages": {k: round(v, 3) for k, v in self.breakdown().items()},
+                "counters": self.counters, "values": self.values}
+
+
+class _Registry:
+    def __init__(self):
+        self.counters = {}
+        self.stages = {}   # name -> [count, seconds]
+        self.values = {}   # name -> [count, sum]
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def incr(self, name, n):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        with self._lock:
+            entry = self.values.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return (dict(self.counters), {k: list(v) for k, v in self.stages.items()},
+                    {k: list(v) for k, v in self.values.items()})
+
+    def log(self, trace):
+        line = json.dumps(trace.to_dict()) + "\n"
+        with self._log_lock, open(METRICS_LOG, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+_registry = _Registry()
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _TraceContext:
+    def __init__(self, name):
+        self.trace = Trace(name)
+
+    def __enter__(self):
+        self._token = _current.set(self.trace)
+        self._started = time.perf_counter()
+        return self.trace
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        self.trace.seconds = time.perf_counter() - self._started
+        _registry.incr(f"{self.trace.name}_requests", 1)
+        _registry.add_stage(self.trace.name, self.trace.seconds)
+        if METRICS_LOG:
+            _registry.log(self.trace)
+        return False
+
+
+# ---------- RECORDING ----------
+def trace(name):
+    """Collect everything recorded in this context (and its generators) into one Trace."""
+    if not METRICS_ENABLED:
+        return nullcontext(Trace(name))
+    return _TraceContext(name)
+
+
+def current_trace():
+    return _current.get()
+
+
+def span(name):
+    """Time a block as stage `name`."""
+    if not METRICS_ENABLED:
+        return _NULL
+    return _Span(name)
+
+
+def record(name, seconds):
+    """Add an already-measured duration for stage `name`."""
+    if not METRICS_ENABLED:
+        return
+    _registry.add_stage(name, seconds)
+    t = _current.get()
+    if t is not None:
+        t.spans.append((name, seconds))
+
+
+def incr(name, n=1):
+    if not METRICS_ENABLED:
+        return
+    _registry.incr(name, n)
+    t = _current.get()
+    if t is not None:
+        t.counters[name] = t.counters.get(name, 0) + n
+
+
+def observe(name, value):
+    """Record a measurement such as TTFT; the trace keeps the latest value."""
+    if not METRICS_ENABLED:
+        return
+    _registry.observe(name, value)
+    t = _current.get()
+    if t is not None:
+        t.values[name] = round(value, 4)
+
+
+def observe_stream(deltas, name="llm"):
+    """Pass a token stream through, recording TTFT, inter-token gaps, completion tokens and tokens/sec.
+
+    Each streamed delta counts as one completion token, which is how
+    OpenAI-style chat streams deliver them.
+    """
+    if not METRICS_ENABLED:
+        yield from deltas
+        return
+    started = time.perf_counter()
+    first = last = None
+    max_gap = 0.0
+    n = 0
+    try:
+        for delta in deltas:
+            now = time.perf_counter()
+            if first is None:
+                first = now
+                observe("ttft_seconds", first - started)
+            else:
+                max_gap = max(max_gap, now - last)
+            last = now
+            n += 1
+            yield delta
+    finally:
+        ended = time.perf_counter()
+        record(name, ended - started)
+        incr("completion_tokens", n)
+        if n > 1 and last > first:
+            observe("tokens_per_second", (n - 1) / (ended - first))
+            observe("inter_token_seconds", (last - first) / (n - 1))
+            observe("max_inter_token_seconds", max_gap)
+
+
+# ---------- EXPORT ----------
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def render_prometheus(prefix="documind"):
+    """Process totals in the Prometheus text exposition format."""
+    counters, stages, values = _registry.snapshot()
+    lines = []
+    for name, n in sorted(counters.items()):
+        lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {n}"]
+    if stages:
+        lines.append(f"# TYPE {prefix}_stage_seconds summary")
+        for name, (count, seconds) in sorted(stages.items()):
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{_label(name)}"}} {seconds:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{_label(name)}"}} {count}')
+    for name, (count, total) in sorted(values.items()):
+        lines += [f"# TYPE {prefix}_{name} summary",
+                  f"{prefix}_{name}_sum {total:.6f}", f"{prefix}_{name}_count {count}"]
+    return "\n".join(lines) + "\n"
+
+
+def serve(port=METRICS_PORT, host="127.0.0.1"):
+    """Expose render_prometheus() at http://host:port/metrics from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,139 @@
+"""Local stand-in for the streaming chat-completions API.
+
+Speaks just enough HTTP/1.1 (keep-alive, chunked SSE) for httpx and the
+Groq/OpenAI clients, with knobs for latency, throughput and failures:
+
+    python mock_llm_server.py --port 8089 --ttft 0.3 --tokens-per-sec 80 --fail-rate 0.1
+    DOCUMIND_LLM_BASE_URL=http://127.0.0.1:8089/v1 ...
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+
+LOREM = ("The document describes the main points in detail . Key findings are summarized below "
+         "with supporting evidence , followed by open questions and recommended next steps .").split()
+
+
+class MockLLMServer:
+    def __init__(self, ttft=0.2, tokens_per_sec=50.0, max_tokens=64, fail_rate=0.0,
+                 stall_rate=0.0, stall_s=5.0, drop_rate=0.0, drop_after=2, seed=None):
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.max_tokens = max_tokens
+        self.fail_rate = fail_rate
+        self.stall_rate = stall_rate
+        self.stall_s = stall_s
+        self.drop_rate = drop_rate
+        self.drop_after = drop_after
+        self.rng = random.Random(seed)
+        self.requests = 0
+
+    def tokens_for(self, request):
+        """Deterministic reply: echo the tail of the last message, then filler text."""
+        messages = request.get("messages") or [{"content": ""}]
+        words = str(messages[-1].get("content", "")).split()[-8:]
+        limit = min(int(request.get("max_tokens") or self.max_tokens), self.max_tokens)
+        tokens = ["Answer:"] + words + LOREM
+        while len(tokens) < limit:
+            tokens += LOREM
+        return [t + " " for t in tokens[:limit]]
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                self.requests += 1
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                if method != "POST" or not path.rstrip("/").endswith("/chat/completions"):
+                    await self._respond(writer, 404, b'{"error": "not found"}')
+                    continue
+                if self.rng.random() < self.fail_rate:
+                    await self._respond(writer, 503, b'{"error": "overloaded"}')
+                    continue
+                await self._stream(writer, json.loads(body or b"{}"))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, body):
+        writer.write(f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def _stream(self, writer, request):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nTransfer-Encoding: chunked\r\n\r\n")
+        delay = self.stall_s if self.rng.random() < self.stall_rate else self.ttft
+        drop = bool(self.drop_rate) and self.rng.random() < self.drop_rate
+        await asyncio.sleep(delay)
+        created = int(time.time())
+        for i, token in enumerate(self.tokens_for(request)):
+            if drop and i == self.drop_after:
+                # Cut the connection mid-answer, after some deltas went out.
+                writer.transport.abort()
+                raise ConnectionResetError("dropped by mock")
+            event = {"id": "mock", "object": "chat.completion.chunk", "created": created,
+                     "model": request.get("model", "mock"),
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            _write_chunk(writer, f"data: {json.dumps(event)}\n\n".encode())
+            await writer.drain()
+            if self.tokens_per_sec:
+                await asyncio.sleep(1 / self.tokens_per_sec)
+        _write_chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start listening; returns the asyncio server (port 0 picks a free port)."""
+        return await asyncio.start_server(self.handle, host, port)
+
+
+def _write_chunk(writer, data):
+    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock streaming chat-completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="fraction of requests that stall before streaming")
+    parser.add_argument("--stall-s", type=float, default=5.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of streams cut off mid-answer")
+    parser.add_argument("--drop-after", type=int, default=2, help="deltas sent before a stream is cut off")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    mock = MockLLMServer(args.ttft, args.tokens_per_sec, args.max_tokens, args.fail_rate,
+                         args.stall_rate, args.stall_s, args.drop_rate, args.drop_after, args.seed)
+
+    async def serve():
+        server = await mock.start(args.host, args.port)
+        print(f"Mock LLM listening on http://{args.host}:{args.port}/v1", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
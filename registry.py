@@ -0,0 +1,122 @@
+import os
+import time
+import threading
+import weakref
+import metrics
+from backend import document_key
+from ingest import IngestPipeline
+
+# Unreferenced documents stay loaded this long, so a refresh or a second user reuses them.
+IDLE_SECONDS = float(os.getenv("DOCUMIND_DOC_IDLE_S", "600"))
+# Upper bound on unreferenced documents kept warm, oldest dropped first.
+MAX_IDLE_DOCUMENTS = int(os.getenv("DOCUMIND_MAX_IDLE_DOCS", "8"))
+
+
+class _Entry:
+    __slots__ = ("pipeline", "refs", "released")
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.refs = 0
+        self.released = time.monotonic()
+
+
+class DocumentHandle:
+    """A session's reference to a shared document; reads through to its IngestPipeline.
+
+    Release it when the session moves on; a handle that is garbage collected
+    (e.g. with an expired Streamlit session) releases itself.
+    """
+
+    def __init__(self, registry, key, entry):
+        self.key = key
+        self._pipeline = entry.pipeline
+        # Bound to the entry, not the key: a failed ingest's replacement is not ours to release.
+        self._finalizer = weakref.finalize(self, registry.release, entry)
+
+    def __getattr__(self, name):
+        # ready, done, error, chunks, text, pages_done, retrieve, wait, ...
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._pipeline, name)
+
+    def wait(self, timeout=None):
+        self._pipeline.wait(timeout)
+        return self
+
+    def release(self):
+        self._finalizer()
+
+
+def _evict_periodically(ref, interval):
+    # Holds the registry only weakly, so the thread ends with it.
+    while True:
+        time.sleep(interval)
+        registry = ref()
+        if registry is None:
+            return
+        registry.evict()
+        del registry
+
+
+class DocumentRegistry:
+    """Process-wide, content-addressed set of loaded documents shared by every session.
+
+    The first acquire of a document starts its ingest; concurrent and later
+    acquires of the same bytes get a handle to that same pipeline and watch
+    it finish instead of ingesting again. Documents with no handles left are
+    dropped after IDLE_SECONDS, or sooner once MAX_IDLE_DOCUMENTS pile up; a
+    background thread checks, so they expire even when no session is active.
+    """
+
+    def __init__(self, cache=None, idle_seconds=IDLE_SECONDS, max_idle=MAX_IDLE_DOCUMENTS):
+        self.cache = cache
+        self.idle_seconds = idle_seconds
+        self.max_idle = max_idle
+        self._entries = {}
+        self._lock = threading.Lock()
+        interval = min(max(idle_seconds / 2, 0.1), 60.0)
+        threading.Thread(target=_evict_periodically, args=(weakref.ref(self), interval),
+                         name="document-registry-evict", daemon=True).start()
+
+    def acquire(self, data, previous=None):
+        """Handle for `data`; `previous` is a handle to an earlier revision to ingest incrementally against."""
+        key = document_key(data)
+        with self._lock:
+            entry = self._entries.get(key)
+            created = entry is None or entry.pipeline.error is not None
+            if created:
+                # A failed ingest is retried rather than handed out again.
+                base = previous._pipeline if previous is not None else None
+                entry = self._entries[key] = _Entry(IngestPipeline(data, cache=self.cache, base=base))
+            entry.refs += 1
+        metrics.incr("document_registry_misses" if created else "document_registry_hits")
+        if created:
+            entry.pipeline.start()
+        self.evict()
+        return DocumentHandle(self, key, entry)
+
+    def release(self, entry):
+        with self._lock:
+            if entry.refs > 0:
+                entry.refs -= 1
+                entry.released = time.monotonic()
+        self.evict()
+
+    def evict(self):
+        """Drop finished, unreferenced documents that have idled too long or exceed max_idle."""
+        now = time.monotonic()
+        with self._lock:
+            idle = sorted((e.released, key) for key, e in self._entries.items()
+                          if e.refs == 0 and e.pipeline.done)
+            for i, (released, key) in enumerate(idle):
+                if now - released > self.idle_seconds or len(idle) - i > self.max_idle:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._entries),
+                "handles": sum(e.refs for e in self._entries.values()),
+                "ingesting": sum(not e.pipeline.done for e in self._entries.values()),
+            }
@@ -0,0 +1,82 @@
+"""Optional cross-encoder rerank between retrieval and the prompt.
+
+Retrieval over-fetches RERANK_DEPTH x top_k candidates; a small cross-encoder
+scores (query, chunk) pairs on CPU in batches, in retrieval order, and stops
+once later batches can no longer reach the top. Only chunks close to the
+best score go into the prompt, so fewer, better chunks reach the LLM.
+"""
+import os
+import threading
+import numpy as np
+import metrics
+from backend import LRUCache, normalize_query
+
+RERANK_MODEL = os.getenv("DOCUMIND_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_ENABLED = os.getenv("DOCUMIND_RERANK", "") == "1"
+# Candidates fetched per chunk finally kept.
+RERANK_DEPTH = 4
+BATCH_SIZE = 8
+MAX_LENGTH = 256
+# Scores are logits: stop when a whole batch trails the k-th best by STOP_MARGIN,
+# and drop kept chunks more than DROP_MARGIN below the best one.
+STOP_MARGIN = 3.0
+DROP_MARGIN = 5.0
+MIN_KEEP = 1
+SCORE_CACHE_SIZE = 8192
+
+_model = None
+_model_lock = threading.Lock()
+_scores = LRUCache(SCORE_CACHE_SIZE)
+
+
+def get_reranker():
+    global _model
+    with _model_lock:
+        if _model is None:
+            from sentence_transformers import CrossEncoder
+            _model = CrossEncoder(RERANK_MODEL, max_length=MAX_LENGTH, device="cpu")
+    return _model
+
+
+def score_pairs(query, chunks):
+    """Cross-encoder scores for (query, chunk), reusing cached pair scores."""
+    key = normalize_query(query)
+    scores = np.empty(len(chunks), dtype=np.float32)
+    missing = []
+    for i, chunk in enumerate(chunks):
+        cached = _scores.get((key, chunk))
+        if cached is None:
+            missing.append(i)
+        else:
+            scores[i] = cached
+    metrics.incr("rerank_cache_hits", len(chunks) - len(missing))
+    if missing:
+        fresh = get_reranker().predict([(query, chunks[i]) for i in missing], batch_size=len(missing),
+                                       show_progress_bar=False)
+        metrics.incr("rerank_pairs_scored", len(missing))
+        for i, score in zip(missing, fresh):
+            scores[i] = score
+            _scores.put((key, chunks[i]), float(score))
+    return scores
+
+
+def rerank(query, candidates, keep, batch_size=BATCH_SIZE, stop_margin=STOP_MARGIN,
+           drop_margin=DROP_MARGIN, min_keep=MIN_KEEP):
+    """Best `keep` (or fewer) of `candidates`, which arrive best-first from retrieval."""
+    candidates = list(candidates)
+    if len(candidates) <= 1:
+        return candidates
+    with metrics.span("rerank"):
+        scores = []
+        for start in range(0, len(candidates), batch_size):
+            batch = score_pairs(query, candidates[start:start + batch_size])
+            scores.extend(batch.tolist())
+            if len(scores) >= keep and start + batch_size < len(candidates):
+                kth_best = np.partition(scores, -keep)[-keep]
+                if batch.max() < kth_best - stop_margin:
+                    break
+        order = np.argsort(scores)[::-1][:keep]
+        best = scores[order[0]]
+        kept = [i for n, i in enumerate(order) if n < min_keep or scores[i] >= best - drop_margin]
+    metrics.incr("rerank_candidates_scored", len(scores))
+    return [candidates[i] for i in kept]
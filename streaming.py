@@ -0,0 +1,99 @@
+"""Decouple reading an LLM stream from rendering it.
+
+The upstream stream is drained on its own thread into a bounded queue, so a
+slow repaint never stalls the connection; the consumer gets the deltas
+coalesced into frames of at least FRAME_CHARS, or whatever arrived within
+FRAME_SECONDS, instead of one repaint per token. A full queue blocks the
+reader, and a consumer that goes away stops it.
+"""
+import os
+import queue
+import threading
+import contextvars
+import time
+import metrics
+
+# Deltas buffered between reader and consumer before the reader waits.
+BUFFER_DELTAS = int(os.getenv("DOCUMIND_STREAM_BUFFER", "256"))
+# About 20 repaints a second; the first delta is always sent on its own.
+FRAME_SECONDS = 0.05
+FRAME_CHARS = 64
+
+_DONE = object()
+
+
+class _Failure:
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _read(deltas, q, stop):
+    try:
+        for delta in deltas:
+            if not _put(q, delta, stop):
+                break
+    except BaseException as e:
+        _put(q, _Failure(e), stop)
+    finally:
+        close = getattr(deltas, "close", None)
+        if close is not None:
+            # Closing the upstream generator cancels its request (see llm_gateway.stream_sync).
+            close()
+        _put(q, _DONE, stop)
+
+
+def frames(deltas, buffer=BUFFER_DELTAS, frame_seconds=FRAME_SECONDS, frame_chars=FRAME_CHARS):
+    """Yield `deltas` as coalesced frames, reading them on a background thread.
+
+    The reader runs in a copy of the caller's context, so spans and
+    observations made by the upstream generator land in the current trace.
+    """
+    q = queue.Queue(maxsize=buffer)
+    stop = threading.Event()
+    reader = threading.Thread(target=contextvars.copy_context().run, args=(_read, iter(deltas), q, stop),
+                              daemon=True)
+    reader.start()
+    parts, size, sent = [], 0, 0
+    last = float("-inf")
+    try:
+        while True:
+            wait = None
+            if parts:
+                wait = last + frame_seconds - time.perf_counter()
+                if size >= frame_chars or wait <= 0:
+                    yield "".join(parts)
+                    sent += 1
+                    parts, size = [], 0
+                    last = time.perf_counter()
+                    continue
+            try:
+                item = q.get(timeout=wait)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                if parts:
+                    yield "".join(parts)
+                    sent += 1
+                raise item.error
+            parts.append(item)
+            size += len(item)
+        if parts:
+            yield "".join(parts)
+            sent += 1
+    finally:
+        stop.set()
+        metrics.incr("stream_frames", sent)
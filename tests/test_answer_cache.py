@@ -0,0 +1,44 @@
+import numpy as np
+import answer_cache
+from answer_cache import SemanticAnswerCache, answer_scope, cached_answer_stream
+
+
+def test_scope_covers_sampling_settings_and_history():
+    base = answer_scope("doc", "ctx", 0.7, 512)
+    assert answer_scope("doc", "ctx", 0.7, 512, []) == base
+    assert answer_scope("doc", "ctx", 0.2, 512) != base
+    assert answer_scope("doc", "ctx", 0.7, 4096) != base
+    # Regression: "tell me more" replayed another conversation's answer.
+    assert answer_scope("doc", "ctx", 0.7, 512, [("user", "Who signed?"), ("assistant", "Alice.")]) != base
+
+
+def _serve(monkeypatch, n_tokens):
+    calls = []
+
+    def fake_stream(query, context, chat_history, temp, max_tokens):
+        calls.append(query)
+        yield from ["word "] * min(n_tokens, max_tokens)
+
+    monkeypatch.setattr(answer_cache, "embed_query", lambda q: np.ones((1, 8), dtype=np.float32))
+    monkeypatch.setattr(answer_cache, "generate_answer_stream", fake_stream)
+    return calls
+
+
+def _ask(cache, max_tokens):
+    return "".join(cached_answer_stream(cache, "doc", "q", "ctx", [], 0.7, max_tokens))
+
+
+def test_answers_cut_off_at_the_token_limit_are_not_cached(tmp_path, monkeypatch):
+    calls = _serve(monkeypatch, n_tokens=100)
+    cache = SemanticAnswerCache(str(tmp_path / "answers.sqlite3"))
+    _ask(cache, 10)
+    _ask(cache, 10)
+    assert len(calls) == 2
+
+
+def test_complete_answers_are_replayed(tmp_path, monkeypatch):
+    calls = _serve(monkeypatch, n_tokens=5)
+    cache = SemanticAnswerCache(str(tmp_path / "answers.sqlite3"))
+    first = _ask(cache, 10)
+    assert _ask(cache, 10) == first
+    assert len(calls) == 1
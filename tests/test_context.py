@@ -0,0 +1,23 @@
+from context import SUMMARY_HEADER, trim_history
+
+
+def _turns(n):
+    return [(role, f"{role.title()} {i}. " + "detail " * 120)
+            for i in range(n) for role in ("user", "assistant")]
+
+
+def test_trim_history_is_idempotent():
+    # Regression: trimming Conversation.history() again re-summarised the summary to its first line.
+    once = trim_history(_turns(40), 1500, summary="- user: Question from long ago.")
+    assert once[0][1].startswith(SUMMARY_HEADER)
+    assert trim_history(once, 1500) == once
+
+
+def test_short_history_is_kept_verbatim():
+    turns = [("user", "Hi."), ("assistant", "Hello.")]
+    assert trim_history(turns, 1500) == turns
+
+
+def test_previous_summary_is_kept_when_turns_fit():
+    trimmed = trim_history([("user", "Hi.")], 1500, summary="- user: Earlier question.")
+    assert trimmed == [("system", SUMMARY_HEADER + "- user: Earlier question."), ("user", "Hi.")]
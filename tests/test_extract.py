@@ -0,0 +1,39 @@
+from bench import make_pdf, synthetic_pages
+from extract import PageCache, iter_pages
+
+
+def _form_xobject_pdf(text):
+    """One page whose content stream is only `q /Fm0 Do Q`; the text lives in the form XObject."""
+    form = f"BT /F1 12 Tf 72 700 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /XObject << /Fm0 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length 12 >>\nstream\nq /Fm0 Do Q\nendstream",
+        b"<< /Type /XObject /Subtype /Form /BBox [0 0 612 792] /Resources << /Font << /F1 6 0 R >> >> "
+        b"/Length %d >>\nstream\n%s\nendstream" % (len(form), form),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (n, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def test_pages_with_identical_content_streams_do_not_share_cached_text(tmp_path):
+    # Regression: the page cache was keyed on the content stream alone.
+    cache = PageCache(str(tmp_path))
+    for text in ("Invoice total 100 dollars", "Contract terminated today", "Invoice total 100 dollars"):
+        assert list(iter_pages(_form_xobject_pdf(text), cache=cache)) == [(1, text)]
+
+
+def test_parallel_extraction_matches_serial():
+    data = make_pdf(synthetic_pages(12, 50))
+    assert list(iter_pages(data, workers=2)) == list(iter_pages(data, workers=1))
@@ -0,0 +1,32 @@
+import faiss
+import numpy as np
+import pytest
+from indexes import PQ_BITS, build_index, check_index_config
+
+
+def _vectors(n, dim=64):
+    x = np.random.default_rng(0).standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("n", [5, 100, 2 ** PQ_BITS - 1])
+def test_ivfpq_below_pq_training_size_falls_back_to_sq8(n):
+    # Regression: PQ centroid training failed with fewer than 2**PQ_BITS vectors.
+    x = _vectors(n)
+    index = build_index(x, kind="ivfpq", ids=np.arange(n))
+    assert isinstance(faiss.downcast_index(index.index), faiss.IndexIVFScalarQuantizer)
+    _, ids = index.search(x[:3], 1)
+    assert ids[:, 0].tolist() == [0, 1, 2]
+
+
+def test_pq_storage_below_pq_training_size_falls_back_to_sq8():
+    index = build_index(_vectors(100), kind="flat_ip", storage="pq")
+    assert isinstance(index, faiss.IndexScalarQuantizer)
+
+
+def test_hnsw_with_pq_storage_is_rejected_up_front():
+    with pytest.raises(ValueError):
+        check_index_config("hnsw", "pq")
+    with pytest.raises(ValueError):
+        build_index(_vectors(10), kind="hnsw", storage="pq")
+    check_index_config("auto", "pq")
@@ -0,0 +1,28 @@
+import asyncio
+import pytest
+from llm_gateway import GatewayError, LLMGateway
+from mock_llm_server import MockLLMServer
+
+
+def test_stream_cut_after_first_deltas_is_not_retried():
+    # Regression: a retry after a mid-stream drop used to replay the answer after the partial one.
+    async def run():
+        mock = MockLLMServer(ttft=0, tokens_per_sec=0, max_tokens=16, drop_rate=1.0, drop_after=2)
+        server = await mock.start()
+        port = server.sockets[0].getsockname()[1]
+        gateway = LLMGateway(base_url=f"http://127.0.0.1:{port}/v1", api_key="test",
+                             rate=1e6, burst=1000, hedge_after=None)
+        deltas = []
+        try:
+            with pytest.raises(GatewayError):
+                async for delta in gateway.stream_chat({"model": "mock", "messages": [{"role": "user", "content": "q"}]}):
+                    deltas.append(delta)
+        finally:
+            await gateway.aclose()
+            server.close()
+        return deltas, gateway.stats, mock.requests
+
+    deltas, stats, requests = asyncio.run(run())
+    assert deltas == ["Answer: ", "q "]
+    assert stats["retries"] == 0
+    assert requests == 1
@@ -0,0 +1,35 @@
+import gc
+import time
+import pytest
+from registry import DocumentRegistry
+
+NOT_A_PDF = b"not a pdf"
+
+
+def _failed_handle(registry):
+    handle = registry.acquire(NOT_A_PDF)
+    with pytest.raises(Exception):
+        handle.wait(10)
+    return handle
+
+
+def test_release_of_replaced_entry_leaves_new_entry_alone():
+    # Regression: releasing by key decremented the entry that replaced a failed ingest.
+    registry = DocumentRegistry()
+    old = _failed_handle(registry)
+    new = registry.acquire(NOT_A_PDF)
+    assert registry.stats()["handles"] == 1
+    old.release()
+    del old
+    gc.collect()
+    assert registry.stats()["handles"] == 1
+    new.release()
+    assert registry.stats()["handles"] == 0
+
+
+def test_idle_documents_expire_without_further_calls():
+    registry = DocumentRegistry(idle_seconds=0.2)
+    _failed_handle(registry).release()
+    assert registry.stats()["documents"] == 1
+    time.sleep(1.0)
+    assert registry.stats()["documents"] == 0
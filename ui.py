@@ -1,5 +1,13 @@
 import streamlit as st
-from backend import read_pdf, chunk_text, create_vectorstore, retrieve, generate_answer_stream
+import metrics
+from backend import generate_answer_stream
+from context import pack_context
+from answer_cache import ANSWER_CACHE_ENABLED, SemanticAnswerCache, cached_answer_stream
+from conversation import Conversation
+from doc_cache import DocCache
+from registry import DocumentRegistry
+from streaming import frames
+from rerank import RERANK_DEPTH, RERANK_ENABLED, rerank
 
 # ──────────────────────────────────────────────
 # PAGE CONFIG
@@ -243,15 +251,81 @@ hr { border: none !important; height: 1px !important; background: var(--border)
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def get_doc_cache():
+    return DocCache()
+
+
+@st.cache_resource
+def get_registry():
+    # Shared by every session: one copy and one ingest per distinct PDF.
+    return DocumentRegistry(cache=get_doc_cache())
+
+
+@st.cache_resource
+def get_answer_cache():
+    return SemanticAnswerCache()
+
+
+@st.cache_resource
+def start_metrics_server():
+    # One scrape endpoint per process, however many sessions are open.
+    return metrics.serve() if metrics.METRICS_PORT else None
+
+
+start_metrics_server()
+
+
 # ──────────────────────────────────────────────
 # SESSION STATE
 # ──────────────────────────────────────────────
-if "history" not in st.session_state:
-    st.session_state.history = []
+if "conversation" not in st.session_state:
+    # The id rides in the URL, so a refresh or a restarted server picks the chat back up.
+    st.session_state.conversation = Conversation(st.query_params.get("c"))
+    st.query_params["c"] = st.session_state.conversation.id
 if "vector_ready" not in st.session_state:
     st.session_state.vector_ready = False
 if "pdf_name" not in st.session_state:
     st.session_state.pdf_name = None
+if "pdf_file_id" not in st.session_state:
+    st.session_state.pdf_file_id = None
+if "ingest" not in st.session_state:
+    st.session_state.ingest = None
+if "last_trace" not in st.session_state:
+    st.session_state.last_trace = None
+
+
+@st.fragment(run_every=1.0)
+def ingest_progress():
+    """Poll the (possibly shared) ingest; rerun the page once it becomes queryable or finishes."""
+    ingest = st.session_state.ingest
+    if ingest.error is not None or ingest.done or ingest.ready != st.session_state.vector_ready:
+        st.rerun()
+    st.markdown(f"""
+    <div class="dm-info">
+        ⚡ Indexing <strong>{st.session_state.pdf_name}</strong><br>
+        <span style="font-size:0.72rem; opacity:0.7;">
+            {ingest.pages_done} pages read · {len(ingest.chunks)} chunks searchable
+        </span>
+    </div>
+    """, unsafe_allow_html=True)
+
+
+def render_trace(box, trace):
+    """Per-stage timings and LLM throughput for the latest answer."""
+    if trace is None or trace.seconds is None:
+        return
+    rows = [f"{name} · {ms:,.0f} ms" for name, ms in trace.breakdown().items()]
+    if "ttft_seconds" in trace.values:
+        rows.append(f"first token · {trace.values['ttft_seconds'] * 1000:,.0f} ms")
+    if "tokens_per_second" in trace.values:
+        rows.append(f"{trace.values['tokens_per_second']:.0f} tokens/s")
+    box.markdown(f"""
+    <div class="dm-info">
+        ⏱️ <strong>Last answer · {trace.seconds:.2f}s</strong><br>
+        <span style="font-size:0.72rem; opacity:0.7;">{"<br>".join(rows)}</span>
+    </div>
+    """, unsafe_allow_html=True)
 
 
 # ──────────────────────────────────────────────
@@ -281,38 +355,43 @@ with st.sidebar:
 
     if uploaded:
         # Reset if new file uploaded
-        if st.session_state.pdf_name != uploaded.name:
+        previous = None
+        if st.session_state.pdf_file_id != uploaded.file_id:
+            # Same name again: a revised version, indexed against the one already loaded.
+            if st.session_state.pdf_name == uploaded.name:
+                previous = st.session_state.ingest
+            elif st.session_state.ingest is not None:
+                st.session_state.ingest.release()
             st.session_state.vector_ready = False
-            st.session_state.history = []
+            if st.session_state.pdf_file_id is not None:
+                st.session_state.conversation.clear()
             st.session_state.pdf_name = uploaded.name
+            st.session_state.pdf_file_id = uploaded.file_id
+            st.session_state.ingest = None
+
+        if st.session_state.ingest is None:
+            st.session_state.ingest = get_registry().acquire(uploaded.getvalue(), previous=previous)
+            if previous is not None:
+                previous.release()
 
-        if not st.session_state.vector_ready:
-            with st.spinner("⚡ Analyzing document..."):
-                text = read_pdf(uploaded)
-                if not text or not text.strip():
-                    st.error("Could not extract text. The PDF may be image-only.")
-                    st.stop()
-                chunks = chunk_text(text, 800, 200)
-                if not chunks:
-                    st.error("No text chunks created.")
-                    st.stop()
-                index, embeds = create_vectorstore(chunks)
-
-                st.session_state.chunks = chunks
-                st.session_state.index = index
-                st.session_state.embeds = embeds
-                st.session_state.raw_text = text
-                st.session_state.vector_ready = True
+        ingest = st.session_state.ingest
+        if ingest.error is not None:
+            st.error(str(ingest.error))
+            st.stop()
+        st.session_state.vector_ready = ingest.ready
 
         # Show doc info
-        st.markdown(f"""
-        <div class="dm-info">
-            📎 <strong>{uploaded.name}</strong><br>
-            <span style="font-size:0.72rem; opacity:0.7;">
-                {len(st.session_state.chunks)} chunks · {len(st.session_state.raw_text):,} chars
-            </span>
-        </div>
-        """, unsafe_allow_html=True)
+        if ingest.done:
+            st.markdown(f"""
+            <div class="dm-info">
+                📎 <strong>{uploaded.name}</strong><br>
+                <span style="font-size:0.72rem; opacity:0.7;">
+                    {len(ingest.chunks)} chunks · {len(ingest.text):,} chars
+                </span>
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            ingest_progress()
 
     st.markdown("---")
 
@@ -324,29 +403,41 @@ with st.sidebar:
                            help="Maximum response length")
     top_k = st.slider("🔍 Context Chunks", 3, 10, 5,
                       help="How many document chunks to retrieve per question")
+    rerank_context = st.toggle("🎯 Rerank Context", value=RERANK_ENABLED,
+                               help="Over-fetch chunks and keep only the best few, scored by a cross-encoder")
+    reuse_answers = st.toggle("♻️ Reuse Similar Answers", value=ANSWER_CACHE_ENABLED,
+                              help="Replay a cached answer when a paraphrased question hits the same context")
 
     st.markdown("---")
 
     # ── Stats ──
-    if st.session_state.history:
-        user_msgs = len([h for h in st.session_state.history if h[0] == "user"])
+    if len(st.session_state.conversation):
+        user_msgs = st.session_state.conversation.counts.get("user", 0)
         cols = st.columns(2)
         with cols[0]:
             st.markdown(f'<div class="dm-stat"><div class="dm-stat-num">{user_msgs}</div><div class="dm-stat-label">Questions</div></div>', unsafe_allow_html=True)
         with cols[1]:
-            chunks_n = len(st.session_state.get("chunks", []))
+            chunks_n = len(st.session_state.ingest.chunks) if st.session_state.ingest else 0
             st.markdown(f'<div class="dm-stat"><div class="dm-stat-num">{chunks_n}</div><div class="dm-stat-label">Chunks</div></div>', unsafe_allow_html=True)
         st.markdown("")
 
+    # ── Latest request breakdown (filled in after each answer) ──
+    trace_box = st.empty()
+    render_trace(trace_box, st.session_state.last_trace)
+
     # ── Actions ──
     if st.button("🗑️ Clear Chat", use_container_width=True):
-        st.session_state.history = []
+        st.session_state.conversation.clear()
         st.rerun()
 
     if st.button("📄 New Document", use_container_width=True):
         st.session_state.vector_ready = False
-        st.session_state.history = []
+        st.session_state.conversation.clear()
         st.session_state.pdf_name = None
+        st.session_state.pdf_file_id = None
+        if st.session_state.ingest is not None:
+            st.session_state.ingest.release()
+        st.session_state.ingest = None
         st.rerun()
 
 
@@ -385,7 +476,7 @@ else:
 # ──────────────────────────────────────────────
 # WELCOME CARD
 # ──────────────────────────────────────────────
-if not st.session_state.history:
+if not len(st.session_state.conversation):
     st.markdown("""
     <div class="dm-welcome">
         <h3>What would you like to know?</h3>
@@ -405,7 +496,10 @@ if not st.session_state.history:
 # ──────────────────────────────────────────────
 # CHAT DISPLAY
 # ──────────────────────────────────────────────
-for role, msg in st.session_state.history:
+shown = st.session_state.conversation.transcript()
+if len(st.session_state.conversation) > len(shown):
+    st.caption(f"{len(st.session_state.conversation) - len(shown)} earlier messages not shown")
+for role, msg in shown:
     with st.chat_message(role):
         st.markdown(msg)
 
@@ -424,29 +518,38 @@ if query:
 
     with st.chat_message("user"):
         st.markdown(query)
-    st.session_state.history.append(("user", query))
-
-    # Retrieve relevant chunks
-    context_chunks = retrieve(
-        query,
-        st.session_state.chunks,
-        st.session_state.index,
-        st.session_state.embeds,
-        k=top_k,
-    )
-    context = "\n\n---\n\n".join(context_chunks)
-
-    # Stream response
-    with st.chat_message("assistant"):
-        try:
-            reply = st.write_stream(
-                generate_answer_stream(
-                    query, context, st.session_state.history,
-                    temperature, max_tokens
-                )
-            )
-        except Exception as e:
-            reply = f"**Error:** `{str(e)}`\n\nPlease check your API key and try again."
-            st.markdown(reply)
-
-    st.session_state.history.append(("assistant", reply))
\ No newline at end of file
+    # History before this question, which the prompt already carries.
+    history = st.session_state.conversation.history()
+    st.session_state.conversation.append("user", query)
+
+    with metrics.trace("query") as trace:
+        # Retrieve relevant chunks
+        depth = top_k * RERANK_DEPTH if rerank_context else top_k
+        context_chunks = st.session_state.ingest.retrieve(query, k=depth)
+        if rerank_context:
+            context_chunks = rerank(query, context_chunks, keep=top_k)
+        with metrics.span("pack_context"):
+            context = pack_context(context_chunks)
+
+        # Stream response
+        with st.chat_message("assistant"):
+            try:
+                if reuse_answers:
+                    stream = cached_answer_stream(
+                        get_answer_cache(), st.session_state.ingest.key,
+                        query, context, history,
+                        temperature, max_tokens
+                    )
+                else:
+                    stream = generate_answer_stream(
+                        query, context, history,
+                        temperature, max_tokens
+                    )
+                reply = st.write_stream(frames(stream))
+            except Exception as e:
+                reply = f"**Error:** `{str(e)}`\n\nPlease check your API key and try again."
+                st.markdown(reply)
+
+    st.session_state.conversation.append("assistant", reply)
+    st.session_state.last_trace = trace
+    render_trace(trace_box, trace)
\ No newline at end of file